@@ -0,0 +1,68 @@
+import threading
+import pygame
+from collections import OrderedDict
+
+class AssetManager:
+    # Loads images and fonts once and keeps them in a bounded LRU cache.
+    # Images are converted to the display pixel format (convert_alpha() for PNGs) so
+    # blits don't convert on every frame, and scaled copies are memoized per size.
+    # capacity=0 disables caching, which is how the old per-frame loading behaves.
+    # Scenes preload on a worker thread, so the cache itself is locked; loading is not.
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, load):
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+        value = load()
+        with self.lock:
+            if self.capacity > 0:
+                self.cache[key] = value
+                while len(self.cache) > self.capacity:
+                    self.cache.popitem(last=False)
+        return value
+
+    def image(self, path, size=None, alpha=None):
+        # alpha=None keeps per-pixel alpha for PNGs only
+        if alpha is None:
+            alpha = path.lower().endswith(".png")
+        size = tuple(size) if size is not None else None
+        if size is not None:
+            return self._get(("image", path, size, alpha),
+                             lambda: pygame.transform.scale(self.image(path, alpha=alpha), size))
+        return self._get(("image", path, None, alpha), lambda: self._load_image(path, alpha))
+
+    def _load_image(self, path, alpha):
+        image = pygame.image.load(path)
+        if pygame.display.get_surface() is None:
+            # no display yet, pixel format conversion needs one
+            return image
+        return image.convert_alpha() if alpha else image.convert()
+
+    def font(self, path=None, size=36):
+        return self._get(("font", path, size), lambda: pygame.font.Font(path, size))
+
+    def preload(self, images=(), fonts=()):
+        # images: paths or (path, size) pairs, fonts: (path, size) pairs
+        for entry in images:
+            if isinstance(entry, str):
+                self.image(entry)
+            else:
+                self.image(*entry)
+        for path, size in fonts:
+            self.font(path, size)
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+assets = AssetManager()
@@ -0,0 +1,674 @@
+import os
+import sys
+import time
+import numpy as np
+from gesture_identify import classify_hand, classify_batch
+
+def random_landmarks(n, seed=0):
+    # (n, 21, 2) pixel coordinates inside a 640x480 frame
+    rng = np.random.default_rng(seed)
+    points = np.empty((n, 21, 2), dtype=np.float32)
+    points[..., 0] = rng.uniform(0, 640, (n, 21))
+    points[..., 1] = rng.uniform(0, 480, (n, 21))
+    return points
+
+def reference_classify_hand(landmarks):
+    # The original per-frame classifier, kept as the baseline for bench_classify: [id, x, y]
+    # lists into a dict, one finger at a time. classify_hand is a wrapper over the batch
+    # classifier now, so this is what the batch results are checked against.
+    if not landmarks or len(landmarks) < 21:
+        return "unknown_gesture"
+    points = {lm[0]: (lm[1], lm[2]) for lm in landmarks}
+    finger_tips = {"thumb": 4, "index": 8, "middle": 12, "ring": 16, "pinky": 20}
+    finger_pips = {"thumb": 2, "index": 6, "middle": 10, "ring": 14, "pinky": 18}
+    extended_fingers = []
+    thumb_tip, thumb_ip = points.get(4), points.get(3)
+    if thumb_tip and thumb_ip and thumb_tip[0] > thumb_ip[0]:
+        extended_fingers.append("thumb")
+    for finger, tip_id in finger_tips.items():
+        if finger == "thumb":
+            continue
+        tip, pip = points.get(tip_id), points.get(finger_pips[finger])
+        if tip and pip and tip[1] < pip[1] + 20:
+            extended_fingers.append(finger)
+    num_extended = len(extended_fingers)
+    if num_extended <= 1:
+        return "fist"
+    elif 2 <= num_extended <= 3 and "index" in extended_fingers and "middle" in extended_fingers:
+        return "scissor"
+    elif num_extended >= 3:
+        return "paper"
+    return "unknown_gesture"
+
+def bench_classify(n=10000):
+    points = random_landmarks(n)
+    # The per-frame path receives [id, x, y] lists from the detector
+    frames = [[[i, int(x), int(y)] for i, (x, y) in enumerate(p)] for p in points]
+
+    start = time.perf_counter()
+    reference = [reference_classify_hand(landmarks) for landmarks in frames]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_frame = [classify_hand(landmarks) for landmarks in frames]
+    per_frame_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = classify_batch(points.astype(np.int32))
+    batch_time = time.perf_counter() - start
+
+    assert batch == reference, "batch classifier disagrees with the original per-frame classifier"
+    assert per_frame == reference, "classify_hand disagrees with the original per-frame classifier"
+
+    print(f"original per-frame {n} frames: {reference_time * 1000:8.2f} ms ({n / reference_time:10.0f} frames/s)")
+    print(f"classify_hand      {n} frames: {per_frame_time * 1000:8.2f} ms ({n / per_frame_time:10.0f} frames/s)")
+    print(f"classify_batch     {n} frames: {batch_time * 1000:8.2f} ms ({n / batch_time:10.0f} frames/s)")
+    print(f"speedup over the original: {reference_time / batch_time:.1f}x batch, "
+          f"{reference_time / per_frame_time:.1f}x per frame")
+
+def bench_detector(source=None):
+    # Whole capture -> MediaPipe -> classify_hand pipeline on a recording, no camera needed.
+    # source: video file, image directory or .npy landmark stream; synthetic hands by default
+    from frame_source import open_source, SyntheticLandmarkSource
+    from gesture_detector import GestureDetector
+
+    if source is None:
+        source = SyntheticLandmarkSource.from_gestures(["fist", "scissor", "paper"] * 100)
+    else:
+        source = open_source(source)
+    detector = GestureDetector(source)
+    frames, seconds = detector.replay()
+    detector.stop_detection()
+    print(f"detector replay: {frames} frames in {seconds * 1000:.1f} ms ({frames / seconds:.1f} frames/s)")
+
+def bench_roi(source=None):
+    # Full-frame search vs. ROI tracking and smaller inference sizes on a recorded clip:
+    # frames/s and agreement with the full-frame 640x480 gestures and landmarks
+    from frame_source import open_source
+    from gesture_detector import GestureDetector
+
+    if source is None:
+        print("usage: python benchmark.py roi=<video file or image directory>")
+        return
+    variants = [
+        ("full 640x480", {}),
+        ("full 320x240", {"resolution": (320, 240)}),
+        ("roi 256", {"roi": True}),
+        ("roi 192, 320x240", {"roi": True, "roi_size": 192, "resolution": (320, 240)}),
+    ]
+    reference = None
+    for name, options in variants:
+        detector = GestureDetector(open_source(source), **options)
+        results = []
+        detector.channel.subscribe(results.append)
+        frames, seconds = detector.replay()
+        detector.stop_detection()
+        gestures = [result.gesture for result in results]
+        landmarks = [result.landmarks for result in results]
+        if reference is None:
+            reference = gestures, landmarks
+        agreement = np.mean([a == b for a, b in zip(gestures, reference[0])])
+        errors = [np.abs(a - b).mean() for a, b in zip(landmarks, reference[1]) if a is not None and b is not None]
+        error = f"{np.mean(errors):.1f} px" if errors else "n/a"
+        lost = f", roi lost {detector.roi_lost}/{detector.roi_frames}" if detector.roi_tracking else ""
+        print(f"{name:<18} {frames / seconds:7.1f} frames/s  gestures agree {agreement:6.1%}  landmark error {error}{lost}")
+
+def bench_ingest(source=None, frames=300):
+    # Camera ingest per frame on a recorded clip: decode, resize to 640x480, BGR -> RGB
+    # and turning MediaPipe's landmarks into numbers. The old path makes fresh arrays
+    # and [id, x, y] lists, the new one decodes into the source's buffer and reuses
+    # FrameConverter's buffers and one (21, 2) array. Allocations are the blocks and
+    # bytes a stage leaves allocated per frame, counted with tracemalloc while every
+    # output is kept alive.
+    import tracemalloc
+    from types import SimpleNamespace
+    import cv2
+    from frame_source import VideoFileSource, FrameConverter, synthetic_hand
+    from gesture_detector import read_landmarks
+
+    if source is None:
+        print("usage: python benchmark.py ingest=<video file>")
+        return
+    size = (640, 480)
+    # MediaPipe's result for one hand: 21 landmarks with normalized x, y
+    hand = SimpleNamespace(landmark=[SimpleNamespace(x=float(x) / size[0], y=float(y) / size[1])
+                                     for x, y in synthetic_hand("paper")])
+
+    def old_stages():
+        cap = cv2.VideoCapture(source)
+        return cap, [
+            ("capture", lambda _: cap.read()[1]),
+            ("resize", lambda frame: cv2.resize(frame, size)),
+            ("color_convert", lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)),
+            ("landmarks", lambda _: [[i, int(pt.x * size[0]), int(pt.y * size[1])] for i, pt in enumerate(hand.landmark)]),
+        ]
+
+    def new_stages():
+        video = VideoFileSource(source).open()
+        converter = FrameConverter()
+        points = np.empty((21, 2), dtype=np.float32)
+        return video, [
+            ("capture", lambda _: video.read()[1]),
+            ("resize", lambda frame: converter.resize(frame, size)),
+            ("color_convert", converter.rgb),
+            ("landmarks", lambda _: read_landmarks(hand, points)),
+        ]
+
+    def run(stages, count, kept=None):
+        times = {name: 0.0 for name, _ in stages}
+        allocations = {name: [0, 0] for name, _ in stages}
+        done = 0
+        for _ in range(count):
+            value = None
+            for name, stage in stages:
+                if kept is not None:
+                    blocks, current = len(tracemalloc.take_snapshot().traces), tracemalloc.get_traced_memory()[0]
+                start = time.perf_counter()
+                value = stage(value)
+                times[name] += time.perf_counter() - start
+                if value is None:
+                    return done, times, allocations
+                if kept is not None:
+                    kept.append(value)
+                    allocations[name][0] += len(tracemalloc.take_snapshot().traces) - blocks
+                    allocations[name][1] += tracemalloc.get_traced_memory()[0] - current
+            done += 1
+        return done, times, allocations
+
+    for label, make in (("fresh arrays", old_stages), ("reused buffers", new_stages)):
+        capture, stages = make()
+        done, times, _ = run(stages, int(frames))
+        capture.release()
+        capture, stages = make()
+        run(stages, 1)  # buffers are allocated on the first frame
+        kept = []
+        tracemalloc.start()
+        counted, _, allocations = run(stages, min(done, 20), kept)
+        tracemalloc.stop()
+        capture.release()
+        del kept
+        print(f"{label}: {done} frames")
+        for name, seconds in times.items():
+            blocks, size_bytes = allocations[name]
+            print(f"  {name:<14} {seconds / done * 1000:7.3f} ms/frame  {blocks / counted:6.1f} allocs/frame "
+                  f"{size_bytes / counted / 1024:8.1f} KB/frame")
+
+def bench_frame(frames=300):
+    # A level frame: rebuilding every HUD component per frame with no asset
+    # cache (the old behaviour) vs. components built once on top of the cache
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    pygame.init()
+    import config
+    import component
+    from assets import assets
+    from prompt_store import PromptStore
+    config.get_screen()
+
+    falling = PromptStore(["sword"], component.PROMPT_IMAGES)
+    for y in range(0, 600, 150):
+        falling.spawn("sword", (300, y))
+
+    def draw(health_bar, gesture_bar, enemy_health_bar, tune_board, enemy):
+        config.screen.blit(component.load_level_image(), (0, 0))
+        health_bar.draw(config.screen, 5)
+        gesture_bar.draw(config.screen, "Sword")
+        enemy_health_bar.draw(config.screen, 10)
+        tune_board.draw(config.screen)
+        enemy.draw(config.screen)
+        config.screen.blits(falling.blits())
+        pygame.display.flip()
+
+    def build():
+        return (component.HealthStatusBar(), component.GestureStatusBar(), component.EnemyHealthStatusBar(),
+                component.TuneBoard(), component.Enemy((200, 100)))
+
+    capacity = assets.capacity
+    assets.capacity = 0
+    assets.clear()
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw(*build())
+    before = (time.perf_counter() - start) / frames
+
+    assets.capacity = capacity
+    component.preload_level_assets()
+    parts = build()
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw(*parts)
+    after = (time.perf_counter() - start) / frames
+
+    from renderer import DirtyRenderer
+    health_bar, gesture_bar, enemy_health_bar, tune_board, enemy = parts
+
+    def compose(surface):
+        surface.blit(component.load_level_image(), (0, 0))
+        hud_rects = [health_bar.draw(surface, 5), gesture_bar.draw(surface, "Sword"), enemy_health_bar.draw(surface, 10)]
+        tune_board.draw(surface)
+        enemy.draw(surface)
+        return hud_rects
+
+    renderer = DirtyRenderer(config.screen, compose)
+    start = time.perf_counter()
+    for _ in range(frames):
+        for kind in falling.move(10, config.screen_height):
+            falling.spawn(kind, (300, 0))
+        renderer.draw_blits(falling.blits())
+        renderer.present()
+    dirty = (time.perf_counter() - start) / frames
+
+    print(f"per-frame loading: {before * 1000:.3f} ms/frame")
+    print(f"asset cache:       {after * 1000:.3f} ms/frame ({before / after:.1f}x faster)")
+    print(f"dirty rectangles:  {dirty * 1000:.3f} ms/frame ({before / dirty:.1f}x faster)")
+
+class ReferenceSprite:
+    # One falling prompt as the game kept them before PromptStore: an object with its own
+    # rect, moved and drawn one at a time. Only bench_prompts uses it, as the baseline.
+    def __init__(self, kind, image, pos):
+        self.kind = kind
+        self.image = image
+        self.rect = image.get_rect(center=pos)
+        self.prev_y = self.rect.y
+
+    def move(self, dy):
+        self.prev_y = self.rect.y
+        self.rect.y += dy
+
+    def interpolated_rect(self, alpha):
+        return self.rect.move(0, round((self.prev_y - self.rect.y) * (1 - alpha)))
+
+def bench_prompts(counts=(10, 100, 500), steps=200):
+    # One simulation step (move, expire, respawn) plus building the draw list, for a list
+    # of sprite objects and the array-backed PromptStore
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    pygame.init()
+    import component
+    from assets import assets
+    from prompt_store import PromptStore
+
+    kinds = list(component.PROMPT_IMAGES)
+    images = {kind: assets.image(path, (100, 100)) for kind, path in component.PROMPT_IMAGES.items()}
+    for count in counts:
+        objects = [ReferenceSprite(kinds[i % len(kinds)], images[kinds[i % len(kinds)]], (300, -i * 830 // count))
+                   for i in range(count)]
+        start = time.perf_counter()
+        for _ in range(steps):
+            for obj in list(objects):
+                obj.move(10)
+                if obj.rect.y > 830:
+                    objects.remove(obj)
+                    objects.append(ReferenceSprite(obj.kind, obj.image, (300, 0)))
+            [(obj.image, obj.interpolated_rect(0.5)) for obj in objects]
+        list_time = (time.perf_counter() - start) / steps
+
+        store = PromptStore(kinds, component.PROMPT_IMAGES)
+        for i in range(count):
+            store.spawn(kinds[i % len(kinds)], (300, -i * 830 // count))
+        start = time.perf_counter()
+        for _ in range(steps):
+            for kind in store.move(10, 830):
+                store.spawn(kind, (300, 0))
+            store.blits(0.5)
+        store_time = (time.perf_counter() - start) / steps
+
+        print(f"{count:4d} prompts: objects {list_time * 1000:.3f} ms/step, PromptStore {store_time * 1000:.3f} ms/step "
+              f"({list_time / store_time:.1f}x)")
+
+def two_player_hands(hands):
+    # (N, 2, 21, 2) stream of two hands side by side from a one-hand stream, showing
+    # different gestures, found by MediaPipe in either order
+    two = np.stack([np.roll(hands, len(hands) // 6, axis=0) + (100, 0), hands - (160, 0)], axis=1)
+    two[1::2] = two[1::2, ::-1]
+    return two
+
+def bench_players(source=None):
+    # One vs. two tracked hands: detector frames/s and work per frame against the
+    # two-player pacing budget (config.TwoPlayerDetectorHz, of which the PacingScheduler
+    # lets inference use max_utilization). On a video file this is MediaPipe's cost;
+    # without one, the bundled hands measure tracking, classification and smoothing.
+    import config
+    from frame_source import open_source, SyntheticLandmarkSource
+    from gesture_detector import GestureDetector
+    from pacing import PacingScheduler
+
+    hands = np.load(SAMPLE_HANDS)
+    for players in (1, 2):
+        if source is not None:
+            detector = GestureDetector(open_source(source), players=players)
+        else:
+            detector = GestureDetector(SyntheticLandmarkSource(hands if players == 1 else two_player_hands(hands)),
+                                       players=players)
+        frames, seconds = detector.replay()
+        detector.stop_detection()
+        target_hz = config.DetectorTargetHz if players == 1 else config.TwoPlayerDetectorHz
+        budget = PacingScheduler().max_utilization / target_hz
+        work = seconds / frames
+        verdict = "within" if work <= budget else "OVER"
+        print(f"{players} player(s): {frames / seconds:8.1f} frames/s, {work * 1000:7.3f} ms/frame, "
+              f"{verdict} the {budget * 1000:.0f} ms budget of {target_hz} Hz")
+
+def bench_templates(specs=None):
+    # Template classifier (gesture_templates) against classify_hand: us per hand, one at
+    # a time and in one batch, and how often the two agree on the bundled hands. Then
+    # how well the index recognises labeled hands. specs: comma separated, an index file
+    # (.npz, config.GestureIndexPath by default) and recorded clips in the form of
+    # `gesture_templates.py build` arguments, e.g.
+    #     templates=ok=recordings/ok.npy,fist=recordings/fist.npy,sessions/level1-....hfs
+    # Only recordings of real hands give an accuracy figure. Without them the index is
+    # tested on synthetic hands from another seed and with heavier jitter; they come
+    # from the same synthetic_hand model the shipped index was built from, so that
+    # result is a smoke test.
+    import config
+    from gesture_identify import GESTURES
+    from gesture_templates import TemplateIndex, read_templates, synthetic_templates
+
+    specs = specs.split(",") if specs else []
+    paths = [spec for spec in specs if spec.endswith(".npz")]
+    clips = [spec for spec in specs if not spec.endswith(".npz")]
+    index = TemplateIndex.load(paths[0] if paths else config.GestureIndexPath)
+    hands = np.load(SAMPLE_HANDS)
+    runs = 10
+    start = time.perf_counter()
+    for _ in range(runs):
+        rules = [classify_hand(hand) for hand in hands]
+    rules_time = (time.perf_counter() - start) / (runs * len(hands))
+    start = time.perf_counter()
+    for _ in range(runs):
+        single = [index.classify(hand)[0] for hand in hands]
+    single_time = (time.perf_counter() - start) / (runs * len(hands))
+    start = time.perf_counter()
+    for _ in range(runs):
+        codes, _ = index.search(hands)
+    batch_time = (time.perf_counter() - start) / (runs * len(hands))
+
+    assert single == [GESTURES[code] for code in codes], "search disagrees with classify"
+    agree = sum(a == b for a, b in zip(rules, single)) / len(hands)
+    print(f"{len(index.vectors)} templates, k={index.k}")
+    print(f"classify_hand      {rules_time * 1e6:7.1f} us/hand")
+    print(f"templates, single  {single_time * 1e6:7.1f} us/hand")
+    print(f"templates, batch   {batch_time * 1e6:7.1f} us/hand")
+    print(f"agreement with classify_hand on {len(hands)} bundled hands: {agree:.1%}")
+
+    if clips:
+        test_hands, labels = [], []
+        for spec in clips:
+            spec_hands, spec_labels = read_templates(spec)
+            test_hands.append(np.asarray(spec_hands, dtype=np.float32).reshape(-1, 21, 2))
+            labels += list(spec_labels)
+        test_hands = np.concatenate(test_hands)
+        # a plain session.hfs is labeled with what the game recognised, not what was shown
+        print(f"accuracy on {len(test_hands)} recorded hands:")
+    else:
+        test_hands, labels = synthetic_templates(count=50, seed=1001, jitter=(6.0, 10.0))
+        print(f"smoke test, not an accuracy figure: {len(test_hands)} synthetic hands (held-out seed, 6-10 px jitter) "
+              f"from the generator the shipped index was built from; pass recorded clips for accuracy")
+    codes, confidences = index.search(test_hands)
+    labels = np.array(labels)
+    for code in np.unique(labels):
+        shown = labels == code
+        print(f"{GESTURES[code]:>8}: {np.mean(codes[shown] == code):6.1%} recognised, "
+              f"mean confidence {confidences[shown].mean():.2f}")
+
+STARTUP_SCRIPT = """
+import sys, time, pygame
+start = float(sys.argv[1])
+import main
+imported = time.time()
+def first_frame(*args):
+    print((imported - start) * 1000, (time.time() - start) * 1000, "cv2" in sys.modules, "mediapipe" in sys.modules)
+    sys.stdout.flush()
+    import os
+    os._exit(0)
+pygame.display.flip = first_frame
+main.main_menu()
+"""
+
+def bench_startup(runs=5):
+    # Time from launching a fresh interpreter to the first main_menu frame on screen
+    import subprocess
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    imports, frames = [], []
+    for _ in range(int(runs)):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, str(time.time())],
+            env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.split()
+        imports.append(float(output[-4]))
+        frames.append(float(output[-3]))
+        heavy = [name for name, loaded in zip(("cv2", "mediapipe"), output[-2:]) if loaded == "True"]
+    print(f"startup: import main {np.median(imports):.0f} ms, first menu frame {np.median(frames):.0f} ms "
+          f"(median of {runs}), loaded by then: {', '.join(heavy) or 'neither cv2 nor mediapipe'}")
+
+# Repeatable suite: fixed inputs, each case timed in rounds with the garbage collector
+# off, median and best round in ms per operation. `suite` stores them as JSON, `compare`
+# checks them against a saved baseline from the same machine.
+# samples/hands.npy: synthetic hands, SyntheticLandmarkSource.from_gestures(["fist", "scissor",
+# "paper"] * 10, frames_per_gesture=10, jitter=3.0, seed=0).landmarks
+SAMPLE_HANDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples", "hands.npy")
+SUITE_RESULTS = "bench_results.json"
+REGRESSION_THRESHOLD = 0.20  # slower than the baseline by more than this fraction
+REGRESSION_FLOOR_MS = 0.002  # and by more than this, so noise in the fastest cases isn't flagged
+
+def _timed(run, operations, repeats=7):
+    # ms per operation for run(), which performs `operations` of them
+    import gc
+    run()  # warm up caches and buffers
+    rounds = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            rounds.append((time.perf_counter() - start) * 1000 / operations)
+    finally:
+        gc.enable()
+    return {"median_ms": float(np.median(rounds)), "min_ms": min(rounds), "operations": operations, "repeats": repeats}
+
+def _suite_classify():
+    # classify_hand on the bundled hands, in the [id, x, y] lists the detector used to pass
+    hands = np.load(SAMPLE_HANDS)
+    frames = [[[i, int(x), int(y)] for i, (x, y) in enumerate(points)] for points in hands]
+    def run():
+        for _ in range(10):
+            for landmarks in frames:
+                classify_hand(landmarks)
+    return _timed(run, 10 * len(frames))
+
+def _suite_tick(count, steps=2000):
+    # LevelSession.step plus observe with `count` prompts falling, topped up as they are judged
+    from level import LevelDefinition, LevelSession
+    from prompt_store import PromptStore
+    level = LevelDefinition("bench", [], 20)
+    session = LevelSession(level, PromptStore(level.prompts))
+    session.health = session.enemy_health = float("inf")
+    kinds = level.kinds
+    for i in range(count):
+        session.prompts.spawn(kinds[i % len(kinds)], (300, -i * level.hit_y // count))
+    clock = [0]
+    def run():
+        for _ in range(steps):
+            clock[0] += level.update_freq
+            session.step(clock[0])
+            session.observe("fist", None, None, clock[0])
+            for i in range(count - len(session.prompts)):
+                session.prompts.spawn(kinds[i % len(kinds)], level.spawn_pos)
+    return _timed(run, steps)
+
+def _suite_display():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    pygame.init()
+    import config
+    config.get_screen()
+    return pygame, config
+
+def _suite_render(hud_changes, frames=300, count=10):
+    # One frame of run_level's drawing, game.LevelView.update and present, with `count`
+    # prompts falling, the HUD either unchanged or redrawn every frame
+    pygame, config = _suite_display()
+    import component
+    from game import LevelView
+    from level import LevelDefinition, LevelSession
+    from profiler import profiler
+    from prompt_store import PromptStore
+    component.preload_level_assets()
+    level = LevelDefinition("bench", [], 20)
+    session = LevelSession(level, PromptStore(level.prompts, component.PROMPT_IMAGES))
+    kinds = level.kinds
+    for i in range(count):
+        session.prompts.spawn(kinds[i % len(kinds)], (300, -i * level.hit_y // count))
+    view = LevelView(config.screen, [session], [None], component.ProfilerOverlay(profiler))
+    def run():
+        for frame in range(frames):
+            for kind in session.prompts.move(level.fall_step, level.hit_y):
+                session.prompts.spawn(kind, level.spawn_pos)
+            if hud_changes:
+                session.health = frame % 5
+            view.update(0.5)
+            view.renderer.present()
+    return _timed(run, frames)
+
+def _suite_menu(frames=500):
+    # main_menu's screen: background, both buttons, flip
+    pygame, config = _suite_display()
+    import component
+    font = "./asset/WESTG___.ttf"
+    start_button = component.Button("Start Game", (config.screen_width // 6, 100), None, font)
+    quit_button = component.Button("Quit Game", (config.screen_width // 6, 300), None, font)
+    def run():
+        for _ in range(frames):
+            config.screen.blit(component.load_background_image(), (0, 0))
+            start_button.draw(config.screen)
+            quit_button.draw(config.screen)
+            pygame.display.flip()
+    return _timed(run, frames)
+
+def _suite_detector(players=1):
+    # GestureDetector.replay on the bundled hands: classify, smoothing and publishing;
+    # with two players also assigning the hands and classifying them in one batch
+    from frame_source import SyntheticLandmarkSource
+    from gesture_detector import GestureDetector
+    hands = np.load(SAMPLE_HANDS)
+    if players == 2:
+        hands = two_player_hands(hands)
+    def run():
+        for _ in range(5):
+            detector = GestureDetector(SyntheticLandmarkSource(hands), players=players)
+            frames, _ = detector.replay()
+            detector.stop_detection()
+            assert frames == len(hands), f"replayed {frames} of {len(hands)} frames"
+    return _timed(run, 5 * len(hands))
+
+def _suite_templates():
+    # TemplateIndex.classify, one hand at a time, on the bundled hands against the shipped index
+    import config
+    from gesture_templates import TemplateIndex
+    index = TemplateIndex.load(config.GestureIndexPath)
+    hands = list(np.load(SAMPLE_HANDS))
+    def run():
+        for _ in range(2):
+            for hand in hands:
+                index.classify(hand)
+    return _timed(run, 2 * len(hands))
+
+SUITE = {
+    "classify_hand": _suite_classify,
+    "classify_templates": _suite_templates,
+    "simulation_tick_10": lambda: _suite_tick(10),
+    "simulation_tick_100": lambda: _suite_tick(100),
+    "render_frame": lambda: _suite_render(False),
+    "render_frame_hud": lambda: _suite_render(True),
+    "menu_redraw": _suite_menu,
+    "detector_replay": _suite_detector,
+    "detector_replay_2p": lambda: _suite_detector(2),
+}
+
+def _machine():
+    import platform
+    import subprocess
+    import pygame
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count(), "numpy": np.__version__,
+            "pygame": pygame.version.ver, "commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def bench_suite(path=SUITE_RESULTS):
+    # Every SUITE case, printed and written to `path`
+    import json
+    from event_log import log
+    log.configure(level="warning")  # judgements and spawns aren't printed while timing
+    results = {}
+    for name, case in SUITE.items():
+        results[name] = case()
+        print(f"{name:<20} {results[name]['median_ms']:9.4f} ms/op  (best {results[name]['min_ms']:.4f})")
+    with open(path, "w") as file:
+        json.dump({"machine": _machine(), "results": results}, file, indent=2)
+    print(f"results written to {path}")
+
+def bench_compare(paths=None):
+    # compare=baseline.json[,results.json]: every case whose median got slower than the
+    # baseline's beyond REGRESSION_THRESHOLD. Returns False if there is one.
+    import json
+    if paths is None:
+        print("usage: python benchmark.py compare=baseline.json[,results.json]")
+        return
+    baseline_path, _, results_path = paths.partition(",")
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    with open(results_path or SUITE_RESULTS) as file:
+        current = json.load(file)
+    for key in ("machine", "processor", "cpus", "python"):
+        if baseline["machine"].get(key) != current["machine"].get(key):
+            print(f"warning: {key} differs ({baseline['machine'].get(key)} vs {current['machine'].get(key)}), "
+                  f"timings may not be comparable")
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            print(f"{name:<20} {result['median_ms']:9.4f} ms/op  (not in baseline)")
+            continue
+        before, after = baseline["results"][name]["median_ms"], result["median_ms"]
+        change = after / before - 1 if before else 0.0
+        regressed = change > REGRESSION_THRESHOLD and after - before > REGRESSION_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<20} {before:9.4f} -> {after:9.4f} ms/op  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    for name in baseline["results"].keys() - current["results"].keys():
+        print(f"{name:<20} missing from {results_path or SUITE_RESULTS}")
+    print(f"{len(regressions)} regression(s)" + (f": {', '.join(regressions)}" if regressions else ""))
+    return not regressions
+
+BENCHMARKS = {
+    "classify": bench_classify,
+    "detector": bench_detector,
+    "roi": bench_roi,
+    "ingest": bench_ingest,
+    "frame": bench_frame,
+    "prompts": bench_prompts,
+    "startup": bench_startup,
+    "players": bench_players,
+    "templates": bench_templates,
+    "suite": bench_suite,
+    "compare": bench_compare,
+}
+
+if __name__ == "__main__":
+    # name or name=argument, e.g. `python benchmark.py detector=recordings/session1.mp4`
+    names = sys.argv[1:] or list(BENCHMARKS)
+    failed = False
+    for name in names:
+        name, _, arg = name.partition("=")
+        print(f"== {name}")
+        if arg:
+            outcome = BENCHMARKS[name](arg)
+        else:
+            outcome = BENCHMARKS[name]()
+        failed = failed or outcome is False
+    # nonzero exit when compare found a regression, for scripts and CI
+    sys.exit(1 if failed else 0)
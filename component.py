@@ -1,12 +1,13 @@
 import pygame
 import config
+from assets import assets
 
 class Button:
     def __init__(self, text, pos, callback, font = None, font_size = 36):
         self.text = text
         self.pos = pos
         self.callback = callback
-        self.font = pygame.font.Font(font, font_size)
+        self.font = assets.font(font, font_size)
         self.rendered_text = self.font.render(self.text, True, (255, 255, 255))
         self.rect = self.rendered_text.get_rect(center=self.pos)
 
@@ -21,107 +22,131 @@ class Button:
 class HealthStatusBar:
     def __init__(self, font = None, font_size = 36):
         self.pos = (700,900)
-        self.font = pygame.font.Font(font, font_size)
+        self.font = assets.font(font, font_size)
         self.rendered_text = self.font.render("Health:", True, (255, 0, 0))
         self.rect = self.rendered_text.get_rect(center=self.pos)
 
     def draw(self, screen, health):
         self.rendered_text = self.font.render("Health: " + str(health), True, (255, 0, 0))
-        screen.blit(self.rendered_text, self.rect)
+        return screen.blit(self.rendered_text, self.rect)
 
 class EnemyHealthStatusBar:
     def __init__(self, font = None, font_size = 36):
         self.pos = (700,600)
-        self.font = pygame.font.Font(font, font_size)
+        self.font = assets.font(font, font_size)
         self.rendered_text = self.font.render("Enemy Health:", True, (255, 0, 0))
         self.rect = self.rendered_text.get_rect(center=self.pos)
 
     def draw(self, screen, health):
         self.rendered_text = self.font.render("Enemy Health: " + str(health), True, (255, 0, 0))
-        screen.blit(self.rendered_text, self.rect)
+        return screen.blit(self.rendered_text, self.rect)
 
 class GestureStatusBar:
     def __init__(self, font = None, font_size = 36):
         self.pos = (700,950)
-        self.font = pygame.font.Font(font, font_size)
+        self.font = assets.font(font, font_size)
         self.rendered_text = self.font.render("Gesture:", True, (255, 0, 0))
         self.rect = self.rendered_text.get_rect(center=self.pos)
 
     def draw(self, screen, gesture):
         self.rendered_text = self.font.render("Gesture: " + gesture, True, (255, 0, 0))
-        screen.blit(self.rendered_text, self.rect)
+        return screen.blit(self.rendered_text, self.rect)
+
+class PlayerStatusBar:
+    # Health and gesture of one player, above their lane in a two-player level
+    def __init__(self, player, pos, font = None, font_size = 36):
+        self.player = player
+        self.pos = pos
+        self.font = assets.font(font, font_size)
+
+    def draw(self, screen, health, gesture):
+        self.rendered_text = self.font.render(f"P{self.player + 1}: {health} {gesture}", True, (255, 0, 0))
+        return screen.blit(self.rendered_text, self.rendered_text.get_rect(center=self.pos))
 
 class TuneBoard:
     # draw tune.jpg
     def __init__(self):
         self.pos = (0,0)
-        self.image = pygame.image.load("./img/tune.jpg")
+        self.image = assets.image("./img/tune.jpg")
     def draw(self, screen):
         screen.blit(self.image, self.pos)
 
-class Fist:
-    def __init__(self, pos):
-        self.image = pygame.image.load("./img/fist.png")
-        self.image = pygame.transform.scale(self.image, (100, 100))
-        self.rect = self.image.get_rect(center=pos)
-
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-    def move(self, dy):
-        self.rect.y += dy
-
-class Sword:
-    def __init__(self, pos):
-        self.image = pygame.image.load("./img/sword.png")
-        self.image = pygame.transform.scale(self.image, (100, 100))
-        self.rect = self.image.get_rect(center=pos)
-
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-    def move(self, dy):
-        self.rect.y += dy
-
-class Shield:
-    def __init__(self, pos):
-        self.image = pygame.image.load("./img/shield.png")
-        self.image = pygame.transform.scale(self.image, (100, 100))
-        self.rect = self.image.get_rect(center=pos)
-
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-    def move(self, dy):
-        self.rect.y += dy
+class ProfilerOverlay:
+    # Timing percentiles in the top left corner, toggled with F3, and with the detector's
+    # pacing.PacingScheduler its rate and dropped and skipped camera frames
+    STAGES = ("frame", "events", "simulation", "render", "present",
+              "capture", "resize", "color_convert", "inference", "filter", "classify", "camera_to_judgement")
 
-class ok:
-    def __init__(self, pos):
-        self.image = pygame.image.load("./img/ok.png")
-        self.image = pygame.transform.scale(self.image, (100, 100))
-        self.rect = self.image.get_rect(center=pos)
-
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-    def move(self, dy):
-        self.rect.y += dy
+    def __init__(self, profiler, scheduler=None, pos=(5, 5), font=None, font_size=18, refresh_ms=250):
+        self.profiler = profiler
+        self.scheduler = scheduler
+        self.pos = pos
+        self.font = assets.font(font, font_size)
+        self.refresh_ms = refresh_ms
+        self.visible = False
+        self.last_refresh = None
+        self.image = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.last_refresh = None
+
+    def blit(self):
+        # (image, rect) for the renderer, the text is re-rendered a few times per second
+        now = pygame.time.get_ticks()
+        if self.last_refresh is None or now - self.last_refresh >= self.refresh_ms:
+            self.last_refresh = now
+            lines = ["stage        p50    p95    p99 ms"]
+            for stage in self.STAGES:
+                values = self.profiler.percentiles(stage)
+                if values is not None:
+                    lines.append(f"{stage[:12]:<12} {values[0]:6.2f} {values[1]:6.2f} {values[2]:6.2f}")
+            if self.scheduler is not None:
+                stats = self.scheduler.stats()
+                lines.append(f"detector {stats['rate_hz']:5.1f} Hz, dropped {stats['dropped']}, skipped {stats['skipped']}")
+            rendered = [self.font.render(line, True, (255, 255, 0)) for line in lines]
+            height = self.font.get_linesize()
+            self.image = pygame.Surface((max(r.get_width() for r in rendered) + 6, height * len(rendered) + 6))
+            for i, line in enumerate(rendered):
+                self.image.blit(line, (3, 3 + i * height))
+        return self.image, self.image.get_rect(topleft=self.pos)
+
+# Prompt kind used in level recipes -> sprite, drawn by prompt_store.PromptStore
+PROMPT_IMAGES = {
+    "sword": "./img/sword.png",
+    "fist": "./img/fist.png",
+    "shield": "./img/shield.png",
+    "ok": "./img/ok.png",
+}
 
 class Enemy:
     def __init__(self, position=(550,100)):
-        self.image = pygame.image.load('./img/enemy.png')
+        self.image = assets.image('./img/enemy.png')
         self.rect = self.image.get_rect(topleft=position)
 
     def draw(self, screen):
         screen.blit(self.image, self.rect)
 
-background_image = pygame.image.load("./img/OpenMenuBg.jpg")
-background_image = pygame.transform.scale(background_image, (config.screen_width, config.screen_height))
-# preparation_image = pygame.image.load("./img/PreparationSceneBG.png")
-# preparation_image = pygame.transform.scale(preparation_image, (config.screen_width, config.screen_height))
-level1_image = pygame.image.load("./img/Level1BG.jpg")
-level1_image = pygame.transform.scale(level1_image, (350, config.screen_height))
+# Scene images are loaded on first use, importing this module needs no display
+def load_background_image():
+    return assets.image("./img/OpenMenuBg.jpg", (config.screen_width, config.screen_height))
+
+def load_level_image():
+    return assets.image("./img/Level1BG.jpg", (350, config.screen_height))
 
 def load_preparation_image():
-    image = pygame.image.load("./img/PreparationSceneBG.png")
-    return pygame.transform.scale(image, (config.screen_width, config.screen_height))
\ No newline at end of file
+    return assets.image("./img/PreparationSceneBG.png", (config.screen_width, config.screen_height))
+
+# Sprites the level loops need, loaded before the first prompt falls
+LEVEL_ASSETS = [
+    ("./img/Level1BG.jpg", (350, config.screen_height)),
+    ("./img/fist.png", (100, 100)),
+    ("./img/sword.png", (100, 100)),
+    ("./img/shield.png", (100, 100)),
+    ("./img/ok.png", (100, 100)),
+    "./img/tune.jpg",
+    "./img/enemy.png",
+]
+
+def preload_level_assets():
+    assets.preload(images=LEVEL_ASSETS, fonts=[(None, 36)])
\ No newline at end of file
@@ -1,12 +1,79 @@
+import os
 import pygame
 import sys
 
 screen_width = 400
 screen_height = 600
-screen = pygame.display.set_mode((screen_width, screen_height))
-pygame.display.set_caption("Anicent Ritual")
+screen = None  # created by get_screen(), so importing the game doesn't open a window
 
-Level1Recipe = [["sword", 4], ["fist", 6], ["shield", 7.4], ["fist", 9], ["sword", 10.4], ["sword", 12.8], ["sword", 14.8], ["fist", 16.4], ["sword", 18], ["fist", 20],["fist", 22],["sword", 24],["sword", 26],["sword", 28] ]
-Level2Recipe = [["sword", 4], ["fist", 6], ["shield", 7.4], ["fist", 9], ["sword", 10.4], ["sword", 12.8], ["sword", 14.8], ["fist", 16.4], ["sword", 18], ["fist", 20],["fist", 22],["sword", 24],["sword", 26],["sword", 28] ]
-Level1UpdateFreq = 3  # 5 ticks move 1 px
-Level2UpdateFreq = 1  # 3 ticks move 1 px
\ No newline at end of file
+# Run without a window (SDL dummy video driver), used by headless.py and the benchmarks
+Headless = os.environ.get("SDL_VIDEODRIVER") == "dummy"
+
+def get_screen():
+    global screen
+    if screen is None:
+        if Headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        screen = pygame.display.set_mode((screen_width, screen_height))
+        pygame.display.set_caption("Anicent Ritual")
+    return screen
+
+# Levels are files in LevelDir (levels/level1.json, ...), see level_file.py. Their compiled
+# schedules are cached in LevelCacheDir; with LevelHotReload a level restarts when its
+# file is saved, near where it was, without restarting the game
+LevelDir = "./levels"
+LevelCacheDir = "./levels/.cache"
+LevelHotReload = False
+
+FPS = 60  # frame rate cap, the game loop sleeps for the rest of each frame
+
+# Gesture detector pacing: updates per second and how old (seconds) a camera frame
+# may get before it is dropped, None means one update period
+DetectorTargetHz = 30
+DetectorLatencyBudget = None
+# Two players (P in the level menu) play a level against each other, each in their own
+# lane of prompts centered at TwoPlayerLanes[player]. Tracking two hands costs MediaPipe
+# a hand search on most frames, so the detector is paced at TwoPlayerDetectorHz;
+# `python benchmark.py players=<video>` measures whether a machine keeps up
+TwoPlayerLanes = (100, 300)
+TwoPlayerDetectorHz = 20
+# "thread" runs MediaPipe inside the game process, "process" in a separate worker process
+DetectorBackend = "thread"
+# Frame size for a full-frame MediaPipe search; with DetectorROI the detector searches a
+# small crop around the hand's last position and only falls back to the full frame
+DetectorResolution = (640, 480)
+DetectorROI = False
+# The detector smooths landmarks and gestures over time; a level takes its gesture once
+# the smoothing confidence reaches this (0-1), the per-level debounce counts are for
+# detectors without smoothing
+DetectorSmoothing = True
+GestureConfidence = 0.6
+# "rules" classifies hands by which fingers are extended (no "ok"), "templates" by their
+# nearest recorded hands in the index at GestureIndexPath, any hand and any size;
+# build it with `python gesture_templates.py build <path> <recordings...>`
+GestureClassifier = "rules"
+GestureIndexPath = "./models/gestures.npz"
+# Detector results older than this (seconds) count as no hand, e.g. when the camera stalls
+GestureMaxAge = 0.5
+# A prompt is hit when its gesture was shown, by camera capture time, at any point from
+# JudgeWindow[0] ms before to JudgeWindow[1] ms after it reached the line; the judgement
+# waits for camera frames from the end of that window, but at most JudgeMaxWait ms
+JudgeWindow = (150, 150)
+JudgeMaxWait = 500
+# Latency (ms) capture timestamps don't cover, measured by the calibration (C in the
+# level menu) and kept here
+CalibrationPath = "./calibration.txt"
+# How long (seconds) a level waits for a detector that is still loading its model
+DetectorWarmupWait = 2.0
+
+# F3 toggles the timing overlay in a level, F4 writes a Chrome trace and a summary here
+ProfileDir = "./profile"
+
+# Game events (judgements, gesture changes, ...) are written by a background thread;
+# set a path to keep them as JSON lines, level is "debug", "info", "warning" or "error"
+EventLogPath = None
+EventLogLevel = "info"
+
+# Set to record every level to SessionDir for replay with `python session_record.py replay <file>`
+RecordSessions = False
+SessionDir = "./sessions"
\ No newline at end of file
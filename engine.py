@@ -0,0 +1,58 @@
+import time
+import pygame
+
+class GameLoop:
+    # Fixed-timestep simulation decoupled from rendering.
+    #
+    #     loop = GameLoop(level.update_freq, config.FPS)
+    #     while True:
+    #         for sim_time in loop.steps():
+    #             update(sim_time)        # runs once per step_ms of game time
+    #         render(loop.alpha)          # interpolate between the last two steps
+    #         loop.tick()                 # cap the frame rate and sleep when idle
+    #
+    # A scene on the scene.SceneManager awaits manager.next_frame() instead of tick().
+    #
+    # sim_time advances in exact step_ms increments, so the same schedule plays out the
+    # same way on any hardware. If the machine falls more than max_steps behind, the
+    # backlog is dropped and the game slows down instead of freezing.
+    def __init__(self, step_ms, fps=60, max_steps=10):
+        self.step_ms = step_ms
+        self.fps = fps
+        self.max_steps = max_steps
+        self.clock = pygame.time.Clock()
+        self.reset()
+
+    def reset(self):
+        self.last_time = pygame.time.get_ticks()
+        self.last_clock = time.perf_counter()
+        self.sim_time = 0
+        self.accumulator = 0
+        self.clock.tick()
+
+    def steps(self):
+        now = pygame.time.get_ticks()
+        self.last_clock = time.perf_counter()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        steps = 0
+        while self.accumulator >= self.step_ms:
+            if steps == self.max_steps:
+                self.accumulator %= self.step_ms
+                break
+            self.accumulator -= self.step_ms
+            self.sim_time += self.step_ms
+            steps += 1
+            yield self.sim_time
+
+    def sim_time_at(self, clock):
+        # Game time (ms) of a time.perf_counter() reading, e.g. a camera capture
+        return round(self.sim_time + self.accumulator - (self.last_clock - clock) * 1000)
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
+
+    def tick(self):
+        # Clock.tick() sleeps instead of spinning, so an idle level doesn't use a whole core
+        return self.clock.tick(self.fps)
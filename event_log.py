@@ -0,0 +1,136 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+LEVELS_BY_NAME = {name: level for level, name in LEVEL_NAMES.items()}
+
+class EventLog:
+    # Structured game event log that never blocks the caller.
+    #
+    #     log.info("judgement", prompt="Sword", gesture="Fist", correct=False)
+    #
+    # Records go into a bounded queue and a background thread writes them as JSON lines
+    # to `path` and, from `console_level` up, as one short line to stdout. When the queue
+    # is full the record is dropped and counted instead of stalling the game loop.
+    # limit() caps how often an event is kept (token bucket) and sample() keeps every
+    # n-th; suppressed records are counted in the next record of that event.
+    def __init__(self, path=None, level=INFO, console_level=INFO, queue_size=1024):
+        self.path = path
+        self.level = level
+        self.console_level = console_level
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rate_limits = {}
+        self.samples = {}
+        self.suppressed = {}
+        self.dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def configure(self, path=None, level=None, console_level=None):
+        # levels may be given by name, e.g. level="debug"
+        level = LEVELS_BY_NAME.get(level, level)
+        console_level = LEVELS_BY_NAME.get(console_level, console_level)
+        with self.lock:
+            if path is not None:
+                self.path = path
+            if level is not None:
+                self.level = level
+            if console_level is not None:
+                self.console_level = console_level
+
+    def limit(self, event, per_second, burst=1):
+        # [tokens, last refill time, per_second, burst]
+        self.rate_limits[event] = [burst, time.monotonic(), per_second, burst]
+
+    def sample(self, event, every):
+        self.samples[event] = [0, every]
+
+    def _allowed(self, event):
+        sample = self.samples.get(event)
+        if sample is not None:
+            sample[0] += 1
+            if sample[0] % sample[1]:
+                return False
+        bucket = self.rate_limits.get(event)
+        if bucket is not None:
+            now = time.monotonic()
+            bucket[0] = min(bucket[3], bucket[0] + (now - bucket[1]) * bucket[2])
+            bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+        return True
+
+    def log(self, severity, event, /, **fields):
+        if severity < self.level:
+            return
+        if not self._allowed(event):
+            self.suppressed[event] = self.suppressed.get(event, 0) + 1
+            return
+        record = {"t": time.time(), "severity": LEVEL_NAMES.get(severity, severity), "event": event}
+        record.update(fields)
+        suppressed = self.suppressed.pop(event, 0)
+        if suppressed:
+            record["suppressed"] = suppressed
+        try:
+            self.queue.put_nowait((severity, record))
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.thread is None:
+            self._start()
+
+    def debug(self, event, /, **fields):
+        self.log(DEBUG, event, **fields)
+
+    def info(self, event, /, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, /, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, /, **fields):
+        self.log(ERROR, event, **fields)
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._write_loop, name="event-log", daemon=True)
+                self.thread.start()
+
+    def _write_loop(self):
+        file = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            severity, record = item
+            if self.path is not None and file is None:
+                file = open(self.path, "a")
+            if file is not None:
+                file.write(json.dumps(record, default=str) + "\n")
+            if severity >= self.console_level:
+                fields = " ".join(f"{key}={value}" for key, value in record.items() if key not in ("t", "severity", "event"))
+                print(f"[{record['severity']}] {record['event']} {fields}".rstrip(), file=sys.stdout)
+            if self.queue.empty():
+                if file is not None:
+                    file.flush()
+                sys.stdout.flush()
+        if file is not None:
+            file.close()
+
+    def close(self):
+        # Write everything that is still queued and stop the writer thread
+        if self.thread is None:
+            return
+        self.queue.put(None, timeout=2)
+        self.thread.join(timeout=2)
+        self.thread = None
+
+log = EventLog()
@@ -0,0 +1,316 @@
+import os
+import time
+import numpy as np
+from event_log import log
+
+# Every source follows the cv2.VideoCapture shape: read() -> (ret, frame), release().
+# `live` sources are real devices, `finished` is set once a replay runs out of frames and
+# `provides_landmarks` sources return a (21, 2) landmark array instead of a BGR image.
+# Camera and video frames are decoded into one buffer per source, so a frame is only
+# valid until the next read().
+# cv2 takes a while to import, so it is only imported once a source needs it.
+
+class CameraSource:
+    live = True
+    provides_landmarks = False
+
+    def __init__(self, index=0, size=(640, 480), fps=30, fourcc="MJPG"):
+        # size, fps and fourcc are requested once at open(); the driver may pick
+        # something else, what it picked ends up in the same attributes
+        self.index = index
+        self.size = tuple(size)
+        self.fps = fps
+        self.fourcc = fourcc
+        self.cap = None
+        self.frame = None
+        self.finished = False
+        self.last_grab = None
+
+    def open(self):
+        if self.cap is None or not self.cap.isOpened():
+            import cv2
+            self.cap = cv2.VideoCapture(self.index)
+            if not self.cap.isOpened():
+                self.release()
+                raise OSError(f"Cannot open camera {self.index}")
+            # MJPG lets USB cameras deliver 640x480 at 30 fps, raw YUYV often can't
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # a property the driver doesn't report comes back as 0 or -1: keep the requested value
+            width, height = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            self.size = (width if width > 0 else self.size[0], height if height > 0 else self.size[1])
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self.fps = fps if fps > 0 else self.fps
+            code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+            self.fourcc = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code > 0 else self.fourcc
+            self.frame = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+            log.info("camera_opened", index=self.index, size=self.size, fps=self.fps, fourcc=self.fourcc)
+        return self
+
+    def _decoded(self, ret, frame):
+        # cv2 decodes into self.frame, unless the driver changed the frame size
+        if ret and frame is not self.frame:
+            self.frame = frame
+        return ret, frame
+
+    def read(self):
+        if self.cap is None:
+            self.open()
+        return self._decoded(*self.cap.read(self.frame))
+
+    def read_latest(self, stale_after, max_drop=5):
+        # Returns (ret, frame, dropped). The driver keeps queueing frames while we run
+        # inference; a grab that returns immediately after such a gap hands back a queued
+        # frame, so discard those without decoding them until one has to wait for the sensor.
+        if self.cap is None:
+            self.open()
+        dropped = 0
+        queued = self.last_grab is not None and time.perf_counter() - self.last_grab > stale_after
+        while True:
+            start = time.perf_counter()
+            if not self.cap.grab():
+                return False, None, dropped
+            self.last_grab = time.perf_counter()
+            if not queued or dropped >= max_drop or self.last_grab - start >= stale_after / 2:
+                break
+            dropped += 1
+        ret, frame = self._decoded(*self.cap.retrieve(self.frame))
+        return ret, frame, dropped
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self.last_grab = None
+
+
+class ReplaySource:
+    # Base class for recorded sources. With realtime=False frames are returned as fast
+    # as they can be read, otherwise read() waits until the frame's timestamp comes up.
+    live = False
+    provides_landmarks = False
+
+    def __init__(self, fps=30, realtime=False, loop=False):
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.finished = False
+        self.frame_index = 0
+        self.start_time = None
+
+    def open(self):
+        self.finished = False
+        self.frame_index = 0
+        self.start_time = None
+        return self
+
+    def _next(self):
+        raise NotImplementedError
+
+    def _rewind(self):
+        raise NotImplementedError
+
+    def read(self):
+        if self.finished:
+            return False, None
+        ret, frame = self._next()
+        if not ret and self.loop and self.frame_index > 0:
+            self._rewind()
+            ret, frame = self._next()
+        if not ret:
+            self.finished = True
+            return False, None
+
+        if self.realtime:
+            if self.start_time is None:
+                self.start_time = time.perf_counter()
+            delay = self.start_time + self.frame_index / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class VideoFileSource(ReplaySource):
+    def __init__(self, path, realtime=False, loop=False):
+        super().__init__(realtime=realtime, loop=loop)
+        self.path = path
+        self.cap = None
+        self.frame = None
+
+    def open(self):
+        super().open()
+        self.release()
+        import cv2
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise FileNotFoundError(f"Cannot open video file: {self.path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+        width, height = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width and height:
+            self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        return self
+
+    def _next(self):
+        if self.cap is None:
+            self.open()
+        ret, frame = self.cap.read(self.frame)
+        if ret:
+            self.frame = frame
+        return ret, frame
+
+    def _rewind(self):
+        import cv2
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+class ImageDirectorySource(ReplaySource):
+    def __init__(self, path, fps=30, realtime=False, loop=False):
+        super().__init__(fps=fps, realtime=realtime, loop=loop)
+        self.path = path
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            raise FileNotFoundError(f"No images found in {path}")
+        self.position = 0
+
+    def open(self):
+        super().open()
+        self.position = 0
+        return self
+
+    def _next(self):
+        if self.position >= len(self.files):
+            return False, None
+        import cv2
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        return frame is not None, frame
+
+    def _rewind(self):
+        self.position = 0
+
+
+class SyntheticLandmarkSource(ReplaySource):
+    # Feeds landmark arrays straight to the classifier, no camera or MediaPipe needed.
+    # (N, 21, 2) is one hand per frame; (N, H, 21, 2) up to H hands per frame, for the
+    # two-player detector, with NaN for a hand that isn't there.
+    provides_landmarks = True
+
+    def __init__(self, landmarks, fps=30, realtime=False, loop=False):
+        super().__init__(fps=fps, realtime=realtime, loop=loop)
+        self.landmarks = np.asarray(landmarks, dtype=np.float32)
+        if self.landmarks.ndim not in (3, 4) or self.landmarks.shape[-2:] != (21, 2):
+            raise ValueError(f"expected an (N, 21, 2) or (N, H, 21, 2) landmark array, got {self.landmarks.shape}")
+        self.position = 0
+
+    @classmethod
+    def from_gestures(cls, gestures, frames_per_gesture=10, jitter=3.0, seed=0, **kwargs):
+        # e.g. from_gestures(["fist", "scissor", "paper"]) -> 30 frames of noisy hands
+        rng = np.random.default_rng(seed)
+        frames = [
+            synthetic_hand(gesture, rng, jitter)
+            for gesture in gestures
+            for _ in range(frames_per_gesture)
+        ]
+        return cls(np.stack(frames), **kwargs)
+
+    def open(self):
+        super().open()
+        self.position = 0
+        return self
+
+    def _next(self):
+        if self.position >= len(self.landmarks):
+            return False, None
+        frame = self.landmarks[self.position]
+        self.position += 1
+        return True, frame
+
+    def _rewind(self):
+        self.position = 0
+
+
+class FrameConverter:
+    # Resizes BGR frames and converts them to RGB for MediaPipe in buffers allocated
+    # once per size, instead of two fresh full-frame arrays per frame. What it returns
+    # is overwritten by the next call for the same size.
+    def __init__(self):
+        self.buffers = {}
+
+    def _buffer(self, name, size):
+        buffer = self.buffers.get((name, size))
+        if buffer is None:
+            buffer = self.buffers[(name, size)] = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        return buffer
+
+    def resize(self, frame, size):
+        # A camera that already delivers `size` costs nothing here
+        if (frame.shape[1], frame.shape[0]) == size:
+            return frame
+        import cv2
+        return cv2.resize(frame, size, dst=self._buffer("resized", size))
+
+    def rgb(self, frame):
+        import cv2
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffer("rgb", (frame.shape[1], frame.shape[0])))
+
+
+def synthetic_hand(gesture, rng=None, jitter=0.0):
+    # Right hand in a 640x480 frame, fingers pointing up
+    extended = {
+        "fist": (),
+        "scissor": ("index", "middle"),
+        "paper": ("thumb", "index", "middle", "ring", "pinky"),
+        "ok": ("middle", "ring", "pinky"),
+    }.get(gesture, ("index",))
+
+    points = np.zeros((21, 2), dtype=np.float32)
+    points[0] = (320, 420)
+    # thumb: 1-4, extended when the tip is right of the IP joint
+    points[1:4] = [(300, 400), (285, 380), (275, 360)]
+    points[4] = (300, 340) if "thumb" in extended else (255, 350)
+    # remaining fingers: mcp, pip, dip, tip
+    for finger, base_id, x in (("index", 5, 330), ("middle", 9, 355), ("ring", 13, 380), ("pinky", 17, 405)):
+        points[base_id] = (x, 380)
+        points[base_id + 1] = (x, 350)
+        if finger in extended:
+            points[base_id + 2] = (x, 310)
+            points[base_id + 3] = (x, 280)
+        else:
+            points[base_id + 2] = (x, 375)
+            points[base_id + 3] = (x, 395)
+    if gesture == "ok":
+        # index finger bent over so its tip rests on the thumb's
+        points[6:9] = [(322, 350), (306, 336), (291, 344)]
+        points[4] = (288, 347)
+
+    if rng is not None and jitter:
+        points += rng.normal(0, jitter, points.shape).astype(np.float32)
+    return points
+
+
+def open_source(spec, realtime=False, loop=False):
+    # camera index, directory of images, .npy landmark stream or any file cv2 can decode
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec)).open()
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, realtime=realtime, loop=loop).open()
+    if spec.endswith(".npy"):
+        return SyntheticLandmarkSource(np.load(spec), realtime=realtime, loop=loop).open()
+    return VideoFileSource(spec, realtime=realtime, loop=loop).open()
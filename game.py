@@ -1,74 +1,133 @@
+import os
+import asyncio
 import pygame
 import time
-import sys
+from functools import partial
 import component
 import config
-import threading
-import cv2
-import mediapipe as mp
-from gesture_identify import classify_hand
-
-class GestureDetector:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5,
-            max_num_hands=1
-        )
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.cap = cv2.VideoCapture(0)
-        self.current_gesture = "None"
-        self.running = False
-        
-    def start_detection(self):
-        self.running = True
-        def detect_loop():
-            while self.running:
-                ret, frame = self.cap.read()
-                if not ret:
-                    continue
-                    
-                frame = cv2.resize(frame, (640, 480))
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = self.hands.process(rgb_frame)
-                
-                if results.multi_hand_landmarks:
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        landmarks = []
-                        for id, pt in enumerate(hand_landmarks.landmark):
-                            x = int(pt.x * 640)
-                            y = int(pt.y * 480)
-                            landmarks.append([id, x, y])
-                        
-                        gesture = classify_hand(landmarks)
-                        self.current_gesture = gesture
-                else:
-                    self.current_gesture = "None"
-                    
-                time.sleep(0.1)  
-        
-        detection_thread = threading.Thread(target=detect_loop)
-        detection_thread.daemon = True
-        detection_thread.start()
-    
-    def stop_detection(self):
-        self.running = False
-        self.cap.release()
-        cv2.destroyAllWindows()
+from gesture_detector import GestureDetector
+from process_detector import ProcessGestureDetector
+from pacing import PacingScheduler
+from renderer import DirtyRenderer
+from engine import GameLoop
+from level import LEVELS, LevelSession
+from prompt_store import PromptStore
+from profiler import profiler
+from assets import assets
+from event_log import log
+from session_record import SessionRecorder
+from judgement import LatencyCalibration, load_latency, save_latency
+from scene import push, replace, POP, QUIT
+from level_file import load_level, LevelWatcher
+
+def gesture_index():
+    # Path of the template index when hands are classified by templates, see config.GestureClassifier
+    return config.GestureIndexPath if config.GestureClassifier == "templates" else None
+
+def create_gesture_detector(players=1):
+    # config.DetectorBackend picks between the in-process thread and a worker process
+    options = {"resolution": config.DetectorResolution, "roi": config.DetectorROI, "smoothing": config.DetectorSmoothing,
+               "players": players, "templates": gesture_index()}
+    target_hz = config.DetectorTargetHz if players == 1 else config.TwoPlayerDetectorHz
+    if config.DetectorBackend == "process":
+        return ProcessGestureDetector(0, target_hz, config.DetectorLatencyBudget, **options)
+    return GestureDetector(scheduler=PacingScheduler(target_hz, config.DetectorLatencyBudget), **options)
+
+class LevelView:
+    # What a level shows: scenery and HUD as the renderer's background, redrawn only when
+    # a player's health or gesture or the enemy's health changed, and every frame the
+    # falling prompts of each LevelSession and the profiler overlay on top.
+    #
+    #     view.update(loop.alpha)
+    #     view.renderer.present()
+    def __init__(self, screen, sessions, lanes, overlay):
+        self.sessions = sessions
+        self.overlay = overlay
+        # HUD and scenery are built once, their images and fonts come from the asset cache
+        self.health_bar = component.HealthStatusBar()
+        self.gesture_bar = component.GestureStatusBar()
+        self.enemy_health_bar = component.EnemyHealthStatusBar()
+        self.player_bars = [component.PlayerStatusBar(player, (lane, 20)) for player, lane in enumerate(lanes)
+                            if lane is not None]
+        self.tune_board = component.TuneBoard()
+        self.enemy = component.Enemy((200, 100))
+        self.level_image = component.load_level_image()
+        self.hud_state = None
+        self.renderer = DirtyRenderer(screen, self.draw_background)
+
+    def draw_background(self, surface):
+        session = self.sessions[0]
+        surface.blit(self.level_image, (0, 0))
+        hud_rects = [
+            self.health_bar.draw(surface, session.health),
+            self.gesture_bar.draw(surface, session.gesture),
+            self.enemy_health_bar.draw(surface, session.enemy_health),
+        ]
+        self.tune_board.draw(surface)  # tune.jpg at (0,0), may overlap with level1_image
+        self.enemy.draw(surface)
+        for bar, player_session in zip(self.player_bars, self.sessions):
+            hud_rects.append(bar.draw(surface, player_session.health, player_session.gesture))
+        return hud_rects
+
+    def update(self, alpha):
+        # Only the HUD text that changed and the falling objects get redrawn
+        state = [(s.health, s.gesture, s.enemy_health) for s in self.sessions]
+        if state != self.hud_state:
+            self.hud_state = state
+            self.renderer.refresh_background()
+        blits = []
+        for player_session in self.sessions:
+            blits += player_session.prompts.blits(alpha)
+        if self.overlay.visible:
+            blits.append(self.overlay.blit())
+        self.renderer.draw_blits(blits)
 
 class ReactionGame:
+    # Game state shared by the scenes, which run on a scene.SceneManager:
+    # preparation_scene picks a level or the calibration and pushes it, they pop back
 
     def __init__(self):
-        self.screen = config.screen
+        self.screen = config.get_screen()
         self.pointing_to = -1
         self.sword = True
         self.amulet = False
         self.shield = False
         self.eyeball = False
-        self.gesture_detector = GestureDetector()
+        # ms of camera and display latency on this machine, see calibration_scene
+        self.latency = load_latency()
+        # Started once and kept warm; paused outside of levels instead of being stopped
+        self.players = 0
+        self.gesture_detector = None
+        self.set_players(1)
+        self.level_assets = None  # background task loading the level sprites
+
+    def set_players(self, players):
+        # One player or two (versus); two need a detector that tracks two hands, which
+        # replaces the current one
+        if players == self.players:
+            return
+        if self.gesture_detector is not None:
+            self.gesture_detector.stop_detection()
+        self.players = players
+        self.gesture_detector = create_gesture_detector(players)
         self.gesture_detector.start_detection()
+        self.gesture_detector.pause()
+        self.gesture_detector.channel.subscribe(lambda result: self.set_gesture(result.gesture), on_change=True)
+        log.info("players", players=players)
+
+    def close(self):
+        self.gesture_detector.stop_detection()
+
+    async def start_detector(self, manager):
+        detector = self.gesture_detector
+        if not detector.running:
+            detector.start_detection()
+            log.info("detector_started")
+        detector.resume()
+        # Give a detector that is still loading a moment, so the first prompts don't meet a
+        # cold model; without a camera (detector_failed) the level starts right away
+        if detector.running and not detector.ready.is_set():
+            await manager.background(detector.ready.wait, config.DetectorWarmupWait)
 
     SetHealth = pygame.event.custom_type()
     SetGesture = pygame.event.custom_type()
@@ -78,34 +137,46 @@ class ReactionGame:
         pygame.event.post(health_event)
     
     def set_gesture(self, gesture):
+        # Called on the detector thread whenever the detected gesture changes
         gesture_event = pygame.event.Event(self.SetGesture, gesture = gesture)
         pygame.event.post(gesture_event)
 
-    def preparation_scene(self):
-        def quit_game():
-            self.gesture_detector.stop_detection()
-            pygame.quit()
-            sys.exit()
-
+    async def preparation_scene(self, manager):
+        self.gesture_detector.pause()
+        if self.level_assets is None:
+            # decoded on a worker thread while the player picks a level
+            self.level_assets = manager.background(component.preload_level_assets)
         preparation_image = component.load_preparation_image()
         config.screen.blit(preparation_image, (0, 0))
         pygame.display.flip()
 
-        level1_button = component.Button("Level 1", [313, 259], self.level1)
-        level2_button = component.Button("Level 2", [281, 207], self.level2)
-        level3_button = component.Button("Level 3", [321, 124], self.level3)
-        level4_button = component.Button("Level 4", [270, 46], self.level4)
+        chosen = []  # the scene a button or key asked for
+        def choose_level(number):
+            return lambda: chosen.append(push(partial(self.run_level, self.pick_level(number))))
+
+        level1_button = component.Button("Level 1", [313, 259], choose_level(1))
+        level2_button = component.Button("Level 2", [281, 207], choose_level(2))
+        level3_button = component.Button("Level 3", [321, 124], choose_level(3))
+        level4_button = component.Button("Level 4", [270, 46], choose_level(4))
+
+        players_font = assets.font(None, 28)
+        def draw_players():
+            # P switches between one player and two
+            label = "2 Players (P)" if self.players == 2 else "1 Player (P)"
+            text = players_font.render(label, True, (255, 255, 255))
+            config.screen.blit(text, text.get_rect(bottomright=(config.screen_width - 10, config.screen_height - 10)))
 
         level1_button.draw(config.screen)
         level2_button.draw(config.screen)
         level3_button.draw(config.screen)
         level4_button.draw(config.screen)
+        draw_players()
 
         while True:
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    quit_game()
+                    return QUIT
                 elif event.type == pygame.MOUSEMOTION:
                     x = event.pos[0]
                     y = event.pos[1]
@@ -123,6 +194,7 @@ class ReactionGame:
                         level2_button.draw(config.screen)
                         level3_button.draw(config.screen)
                         level4_button.draw(config.screen)
+                        draw_players()
 
                     if self.pointing_to == 1:
                         pygame.draw.circle(self.screen, (255,255,255), [313, 259], 30, width=3)
@@ -135,277 +207,234 @@ class ReactionGame:
                     else:
                         config.screen.blit(preparation_image, (0, 0))
                         pygame.display.flip()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+                    chosen.append(push(self.calibration_scene))
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                    self.set_players(3 - self.players)
+                    config.screen.blit(preparation_image, (0, 0))
+                    level1_button.draw(config.screen)
+                    level2_button.draw(config.screen)
+                    level3_button.draw(config.screen)
+                    level4_button.draw(config.screen)
+                    draw_players()
                 level1_button.is_clicked(event)
                 level2_button.is_clicked(event)
                 level3_button.is_clicked(event)
                 level4_button.is_clicked(event)
-                    
-            pygame.display.update()
-
-    def level1(self):
-        print("Level 1")
-        
-        if not hasattr(self.gesture_detector, 'running') or not self.gesture_detector.running:
-            self.gesture_detector.start_detection()
-            print("Gesture Detection Activate")
-
-        self.gesture_stability_counter = 0
-        self.confirmed_gesture = "None"
-        self.gesture_lock_time = 500 
-
-        def init():
-            self.health = 5
-            self.gesture = "None"
-            self.objects = []
-            self.spawn_times = [item[1] * 1000 for item in config.Level1Recipe]
-            self.spawn_index = 0
-            self.enemy_health = 10
-            self.level_start_time = pygame.time.get_ticks()
-
-        def updateVisual():
-            # Adjust positions to fit within screen (400x600)
-            config.screen.blit(component.level1_image, (0, 0))  # Move to (0,0) instead of (550,0)
-            component.HealthStatusBar().draw(config.screen, self.health)
-            component.GestureStatusBar().draw(config.screen, self.gesture)
-            component.EnemyHealthStatusBar().draw(config.screen, self.enemy_health)
-            component.TuneBoard().draw(config.screen)  # tune.jpg at (0,0), may overlap with level1_image
-            # Adjust Enemy position to be visible, e.g., (200,100) instead of (550,100)
-            enemy = component.Enemy((200, 100))  # Create instance with adjusted position
-            enemy.draw(config.screen)
-            for obj in self.objects:
-                obj.draw(config.screen)
-            pygame.display.flip()
-
-        def checkwin():
-            if self.health <= 0:
-                print("You lose")
-                self.spawn_index = 0
-                self.objects = []
-                self.gesture_detector.stop_detection()
-                # Re-initialize the gesture detector for the next game
-                self.gesture_detector = GestureDetector()
-                self.preparation_scene()
-            if self.enemy_health <= 0:
-                print("You win !")
-                print(" You have unlocked the amulet ")
-                self.amulet = True
-                self.spawn_index = 0
-                self.objects = []
-                self.gesture_detector.stop_detection()
-                # Re-initialize the gesture detector for the next game
-                self.gesture_detector = GestureDetector()
-                self.preparation_scene()
-
-        init()
-        last_update_time = pygame.time.get_ticks()
-
-        while True:
-            current_time = pygame.time.get_ticks()
-            if current_time - last_update_time > config.Level1UpdateFreq:
-                for obj in self.objects:
-                    obj.move(10)
-                    if obj.rect.y > 830:
-                        self.objects.remove(obj)
-                        if obj.__class__.__name__ == "Sword":
-                            if self.gesture == "Sword":
-                                self.enemy_health -= 1
-                                print(f"Correct Sword! Enemy Health -1 (Enemy Health: {self.enemy_health})")
-                            else:
-                                self.health -= 1
-                                print(f"Incorrect Gesture! Sword required, but detected {self.gesture}, player health -1 (remained: {self.health})")
-                        elif obj.__class__.__name__ == "Fist":
-                            if self.gesture == "Fist":
-                                self.enemy_health -= 1
-                                print(f"Correct Fist! Enemy Health -1 (Enemy Health: {self.enemy_health})")
-                            else:
-                                self.health -= 1
-                                print(f"Incorrect Gesture! Fist required, but detected {self.gesture}, player health -1 (remained: {self.health})")
-                        elif obj.__class__.__name__ == "Shield":
-                            if self.gesture == "Shield":
-                                self.enemy_health -= 1
-                                print(f"Correct Shield! Enemy Health -1 (Enemy Health: {self.enemy_health})")
-                            else:
-                                self.health -= 1
-                                print(f"Incorrect Gesture! Shield required, but detected {self.gesture}, player health -1 (remained: {self.health})")
-                        checkwin()
-                last_update_time = current_time
-
-            if self.spawn_index < len(self.spawn_times) and current_time - self.level_start_time >= self.spawn_times[self.spawn_index]:
-                item = config.Level1Recipe[self.spawn_index]
-                if item[0] == "sword":
-                    self.objects.append(component.Sword((300, 0)))
-                    print("Sword")
-                elif item[0] == "fist":
-                    self.objects.append(component.Fist((300, 0)))
-                    print("Fist")
-                elif item[0] == "shield":
-                    self.objects.append(component.Shield((300, 0)))
-                    print("shield")
-                self.spawn_index += 1
-
-            detected_gesture = self.gesture_detector.current_gesture
-
-            # Improve consistency
-            if detected_gesture == self.confirmed_gesture:
-                self.gesture_stability_counter += 1
-                if self.gesture_stability_counter >= 3: 
-                    mapped_gesture = "None"
-                    if detected_gesture == "scissor":
-                        mapped_gesture = "Sword"
-                    elif detected_gesture == "fist":
-                        mapped_gesture = "Fist"
-                    elif detected_gesture == "paper":  
-                        mapped_gesture = "Shield"
-                    
-                    if self.gesture != mapped_gesture:
-                        self.gesture = mapped_gesture
-                        print(f"Gesture: {detected_gesture} -> {mapped_gesture}")
-            else:
-                self.gesture_stability_counter = 0
-                self.confirmed_gesture = detected_gesture
+            if chosen:
+                return chosen[0]
 
+            pygame.display.update()
+            await manager.next_frame()
+
+    async def calibration_scene(self, manager, beats=8, lead_in=3, interval_ms=1000):
+        # Measures self.latency for hit judgement: the player switches between fist and
+        # open hand on every flash. The first lead_in flashes only set the beat.
+        log.info("calibration_start")
+        detector = self.gesture_detector
+        await self.start_detector(manager)
+
+        calibration = LatencyCalibration(LEVELS[1].gestures, interval_ms)
+        font = assets.font(None, 28)
+        lines = [font.render(text, True, (255, 255, 255))
+                 for text in ("Switch between fist and", "open hand on every flash", "Esc to cancel")]
+        center = (config.screen_width // 2, config.screen_height // 2 + 60)
+        interval = interval_ms / 1000
+        start = time.perf_counter() + interval
+        end = start + (lead_in + beats - 0.5) * interval
+        beat_shown = -1
+        seen_frame = None
+        while time.perf_counter() < end:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    self.gesture_detector.stop_detection()
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_s:
-                        self.gesture = "Sword"
-                        print("keyboard: Sword")
-                    if event.key == pygame.K_f:
-                        self.gesture = "Fist"
-                        print("keyboard: Fist")
-                    if event.key == pygame.K_h:
-                        self.gesture = "Shield"
-                        print("keyboard: Shield")
-
-            updateVisual()
-            pygame.display.update()
-
-    def level2(self):
-        print("Level 2")
-
-        def init():
-            self.health = 5
-            self.gesture = "None"
-            self.objects = []
-            self.spawn_times = [item[1] * 1000 for item in config.Level2Recipe]  # Convert seconds to milliseconds
-            self.spawn_index = 0
-            self.enemy_health = 10
-            self.level_start_time = pygame.time.get_ticks()  # Record the start time of the level
-
-        def updateVisual():
-            config.screen.blit(component.level1_image, (550, 0))
-            component.HealthStatusBar().draw(config.screen, self.health)
-            component.GestureStatusBar().draw(config.screen, self.gesture)
-            component.EnemyHealthStatusBar().draw(config.screen, self.enemy_health)
-            component.TuneBoard().draw(config.screen)
-            component.Enemy().draw(config.screen)
-            for obj in self.objects:
-                obj.draw(config.screen)
+                    return QUIT
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    log.info("calibration_cancelled")
+                    return POP
+
+            elapsed = time.perf_counter() - start
+            beat = int(elapsed // interval) if elapsed >= 0 else -1
+            flash = beat >= 0 and elapsed % interval < 0.15
+            self.screen.fill((0, 0, 0))
+            for i, line in enumerate(lines):
+                self.screen.blit(line, line.get_rect(center=(config.screen_width // 2, 100 + 30 * i)))
+            pygame.draw.circle(self.screen, (255, 255, 255), center, 60, width=0 if flash else 3)
             pygame.display.flip()
+            # a beat happens when the player sees it, so it is timed at the flip
+            if flash and beat != beat_shown:
+                beat_shown = beat
+                if beat >= lead_in:
+                    calibration.beat(time.perf_counter() * 1000)
+
+            result = detector.latest()
+            if result is not None and result.frame_id != seen_frame:
+                seen_frame = result.frame_id
+                calibration.observe(result.gesture, result.capture_time * 1000, result.confidence)
+            await manager.next_frame()
+
+        latency = calibration.latency()
+        if latency is None:
+            log.warning("calibration_failed", beats=len(calibration.beats), changes=len(calibration.changes))
+            message = "No steady answer, try again"
+        else:
+            self.latency = latency
+            manager.background(save_latency, latency)
+            log.info("calibration", latency_ms=latency)
+            message = f"Latency: {latency} ms"
+        self.screen.fill((0, 0, 0))
+        text = font.render(message, True, (255, 255, 255))
+        self.screen.blit(text, text.get_rect(center=(config.screen_width // 2, config.screen_height // 2)))
+        pygame.display.flip()
+        await asyncio.sleep(1.5)
+        return POP
+
+    def pick_level(self, number):
+        # With hot reload a level is read again when it is picked, cheap thanks to the cache
+        if config.LevelHotReload:
+            self.reload_level(LEVELS[number])
+        return LEVELS[number]
+
+    def reload_level(self, level):
+        # The level from its edited file, or None (and the old one stays) if it doesn't load
+        try:
+            reloaded = load_level(level.path)
+        except (OSError, ValueError) as e:
+            log.warning("level_reload_failed", path=level.path, error=str(e))
+            return None
+        reloaded.number = level.number
+        LEVELS[level.number] = reloaded
+        log.info("level_reloaded", level=reloaded.name, prompts=len(reloaded.schedule))
+        return reloaded
+
+    async def run_level(self, level, manager, start_time=0):
+        players = self.players
+        log.info("level_start", level=level.name, start_time=start_time, players=players)
+
+        detector = self.gesture_detector
+        await self.start_detector(manager)
+
+        recorder = None
+        # recordings replay one player from the start of the chart, so restarts after a
+        # reload and two-player levels aren't recorded
+        if config.RecordSessions and not start_time and players == 1:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            recorder = SessionRecorder(os.path.join(config.SessionDir, f"level{level.number}-{stamp}.hfs"), level,
+                                       self.latency)
+
+        # The rules live in LevelSession, this loop feeds it time, detector results and keys.
+        # Falling prompts live in one array-backed store per player for the whole level;
+        # with two players each one plays the chart in their own lane
+        lanes = [None] if players == 1 else config.TwoPlayerLanes[:players]
+        sessions = [LevelSession(level, PromptStore(level.prompts, component.PROMPT_IMAGES), recorder, self.latency,
+                                 start_time, lane) for lane in lanes]
+        session = sessions[0]  # player 1, who also has the keyboard
+        self.session = session
+
+        if self.level_assets is None:
+            self.level_assets = manager.background(component.preload_level_assets)
+        await self.level_assets
 
         def checkwin():
-            if self.health <= 0:
-                print("You lose")
-                self.spawn_index = 0
-                self.objects = []
-                self.gesture_detector.stop_detection()
-                # Re-initialize the gesture detector for the next game
-                self.gesture_detector = GestureDetector()
-                self.preparation_scene()
-            if self.enemy_health <= 0:
-                print("You win !")
-                print(" You have unlocked the amulet ")
-                self.amulet = True
-                self.spawn_index = 0
-                self.objects = []
-                self.gesture_detector.stop_detection()
-                # Re-initialize the gesture detector for the next game
-                self.gesture_detector = GestureDetector()
-                self.preparation_scene()
-
-        init()
-        last_update_time = pygame.time.get_ticks()  # Reset last update time when the level starts
+            # Returns the versus result to show, None with one player
+            if recorder:
+                manager.background(recorder.close)
+            for player_session in sessions:
+                player_session.prompts.clear()
+            won = any(s.result == "win" for s in sessions)
+            if won and level.reward:
+                setattr(self, level.reward, True)
+            if players == 1:
+                if won:
+                    log.info("level_end", level=level.name, result="win", reward=level.reward)
+                else:
+                    log.info("level_end", level=level.name, result="lose")
+                return None
+            # the first to beat the enemy wins; a player out of health hands the win to the other
+            winners = [player for player, s in enumerate(sessions) if s.result == "win"]
+            if not winners:
+                winners = [player for player, s in enumerate(sessions) if s.result != "lose"]
+            winner = winners[0] + 1 if len(winners) == 1 else None
+            log.info("level_end", level=level.name, result="versus", winner=winner, reward=level.reward if won else None)
+            return f"Player {winner} wins" if winner else "Draw"
+
+        loop = GameLoop(level.update_freq, config.FPS)
+        loop.sim_time = start_time
+        watcher = LevelWatcher([level.path]) if config.LevelHotReload and level.path else None
+        # the process backend paces itself in the child, its stats are logged when it stops
+        overlay = component.ProfilerOverlay(profiler, getattr(detector, "scheduler", None))
+        view = LevelView(config.screen, sessions, lanes, overlay)
+        recorded_state = None
+        seen_frames, seen_ats = [None] * players, [None] * players
 
         while True:
-            current_time = pygame.time.get_ticks()
-            if current_time - last_update_time > config.Level2UpdateFreq:
-                for obj in self.objects:
-                    obj.move(10)
-                    if obj.rect.y > 830:
-                        self.objects.remove(obj)
-                        if obj.__class__.__name__ == "Sword":
-                            if self.gesture == "Sword":
-                                self.enemy_health -= 1
-                            else:
-                                self.health -= 1
-                        elif obj.__class__.__name__ == "Fist":
-                            if self.gesture == "Fist":
-                                self.enemy_health -= 1
-                            else:
-                                self.health -= 1
-                        elif obj.__class__.__name__ == "ok":
-                            if self.gesture == "Ok":
-                                self.enemy_health -= 1
-                            else:
-                                self.health -= 1
-                        elif obj.__class__.__name__ == "Shield":
-                            if self.gesture == "Shield":
-                                self.enemy_health -= 1
-                            else:
-                                self.health -= 1
-                        checkwin()
-                last_update_time = current_time
-
-            if self.spawn_index < len(self.spawn_times) and current_time - self.level_start_time >= self.spawn_times[self.spawn_index]:
-                item = config.Level2Recipe[self.spawn_index]
-                if item[0] == "sword":
-                    self.objects.append(component.Sword((300, 0)))
-                    print("Sword")
-                elif item[0] == "fist":
-                    self.objects.append(component.Fist((300, 0)))
-                    print("Fist")
-                elif item[0] == "ok":
-                    self.objects.append(component.ok((300, 0)))
-                    print("Ok")
-                elif item[0] == "shield":
-                    self.objects.append(component.Shield((300, 0)))
-                    print("Shield")
-                self.spawn_index += 1
-
-            detected_gesture = self.gesture_detector.current_gesture
-            if detected_gesture == "scissor":
-                self.gesture = "Sword"
-            elif detected_gesture == "fist":
-                self.gesture = "Fist"
-            elif detected_gesture == "paper":
-                self.gesture = "Shield"
-            else:
-                self.gesture = "None"
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.gesture_detector.stop_detection()
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.MOUSEMOTION:
-                    print(event.pos)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_s:
-                        self.gesture = "Sword"
-                    if event.key == pygame.K_f:
-                        self.gesture = "Fist"
-                    if event.key == pygame.K_o:
-                        self.gesture = "Ok"
-                    if event.key == pygame.K_b:
-                        self.gesture = "Shield"
-
-            updateVisual()
-            pygame.display.update()
-
-    def level3(self):
-        print("Level 3")
-    def level4(self):
-        print("Level 4")
\ No newline at end of file
+            frame_start = time.perf_counter()
+            with profiler.span("simulation"):
+                for sim_time in loop.steps():
+                    for player_session in sessions:
+                        player_session.step(sim_time)
+                    if any(s.result for s in sessions):
+                        break
+                if any(s.result for s in sessions):
+                    message = checkwin()
+                    if message:
+                        font = assets.font(None, 48)
+                        text = font.render(message, True, (255, 255, 255))
+                        self.screen.blit(text, text.get_rect(center=(config.screen_width // 2, config.screen_height // 2)))
+                        pygame.display.flip()
+                        await asyncio.sleep(1.5)
+                    # back to the level menu; the detector keeps running, the camera stays open
+                    return POP
+
+                for player, player_session in enumerate(sessions):
+                    # One snapshot per frame: gesture, landmarks and times of the same camera frame
+                    result = detector.latest(player)
+                    stale = result is None or time.perf_counter() - result.capture_time > config.GestureMaxAge
+                    if stale:
+                        # no detector result yet, or it stalled: don't keep acting on an old gesture
+                        detected_gesture, detected_time, landmarks, confidence = "None", None, None, 1.0
+                        seen = None
+                    else:
+                        detected_gesture, detected_time = result.gesture, result.capture_time
+                        landmarks, confidence = result.landmarks, result.confidence
+                        if result.frame_id != seen_frames[player]:
+                            # game time of the capture, so judgement doesn't count detector latency
+                            seen_frames[player], seen_ats[player] = result.frame_id, loop.sim_time_at(result.capture_time)
+                        seen = seen_ats[player]
+                    if recorder:
+                        state = (result.frame_id if result is not None else None, stale)
+                        if state != recorded_state:
+                            recorded_state = state
+                            recorder.landmarks(loop.sim_time, detected_gesture, landmarks, confidence, seen)
+                        recorder.frame(loop.sim_time)
+                    player_session.observe(detected_gesture, detected_time, confidence, seen)
+
+            with profiler.span("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        if recorder:
+                            manager.background(recorder.close)
+                        return QUIT
+                    elif event.type == pygame.KEYDOWN and event.key in level.keys:
+                        session.key(level.keys[event.key])
+                    elif event.type == self.SetGesture:
+                        log.debug("detected_gesture", gesture=event.gesture)
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        overlay.toggle()
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                        trace_path, summary_path = profiler.export(config.ProfileDir)
+                        log.info("profile_exported", trace=trace_path, summary=summary_path)
+
+            with profiler.span("render"):
+                view.update(loop.alpha)
+            with profiler.span("present"):
+                view.renderer.present()
+            profiler.record("frame", frame_start, time.perf_counter())
+
+            if watcher is not None and watcher.poll():
+                reloaded = await manager.background(self.reload_level, level)
+                if reloaded is not None:
+                    if recorder:
+                        manager.background(recorder.close)
+                    # same detector and camera, the chart restarts two seconds before where it was
+                    return replace(partial(self.run_level, reloaded, start_time=max(session.sim_time - 2000, 0)))
+            await manager.next_frame()
@@ -0,0 +1,64 @@
+import threading
+from collections import namedtuple
+from event_log import log
+
+log.limit("subscriber_error", per_second=1)
+
+# One detector result. landmarks is a read-only (21, 2) array or None, capture_time is
+# time.perf_counter() when the frame was captured, confidence and changed_time come from
+# the GestureFilter (None without smoothing).
+GestureResult = namedtuple("GestureResult", "frame_id capture_time landmarks gesture confidence changed_time")
+
+
+class GestureChannel:
+    # Hands detector results from the detector thread to the game.
+    #
+    #     result = channel.latest()                  # never blocks, None before the first frame
+    #     result = channel.wait(after=result.frame_id, timeout=0.1)
+    #     channel.subscribe(callback, on_change=True)
+    #
+    # There is one writer. publish() replaces a single reference to an immutable
+    # GestureResult, which is atomic, so latest() takes no lock and always sees a
+    # complete result. wait() blocks on a Condition that publish() notifies.
+    # Subscribers are called on the detector thread and must return quickly.
+    def __init__(self):
+        self.result = None
+        self.condition = threading.Condition()
+        self.subscribers = []
+
+    def publish(self, result):
+        previous = self.result
+        self.result = result
+        for callback, on_change in list(self.subscribers):
+            if on_change and previous is not None and previous.gesture == result.gesture:
+                continue
+            try:
+                callback(result)
+            except Exception as e:
+                log.warning("subscriber_error", error=repr(e))
+        with self.condition:
+            self.condition.notify_all()
+
+    def latest(self):
+        return self.result
+
+    def wait(self, after=None, timeout=None):
+        # First result newer than frame `after` (by default, than the latest one), or
+        # None on timeout
+        if after is None:
+            after = self.result.frame_id if self.result is not None else -1
+        with self.condition:
+            if self.condition.wait_for(lambda: self.result is not None and self.result.frame_id > after, timeout):
+                return self.result
+        return None
+
+    def subscribe(self, callback, on_change=False):
+        # callback(result) for every result, or with on_change only when the gesture differs
+        self.subscribers.append((callback, on_change))
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers = [entry for entry in self.subscribers if entry[0] is not callback]
+
+    def clear(self):
+        self.result = None
@@ -0,0 +1,331 @@
+import sys
+import time
+import threading
+import numpy as np
+from gesture_identify import GESTURES, classify_hand, classify_batch_codes
+from gesture_filter import GestureFilter, update_filters
+from gesture_channel import GestureChannel, GestureResult
+from frame_source import CameraSource, FrameConverter
+from pacing import PacingScheduler
+from players import PlayerTracker
+from gesture_templates import TemplateIndex
+from profiler import profiler
+from event_log import log
+
+# Pixel space of the published landmarks, the one classify_hand's tolerances are tuned for
+LANDMARK_SPACE = (640, 480)
+
+
+def read_landmarks(hand_landmarks, out):
+    # One MediaPipe hand into the (21, 2) float32 array `out`, normalized x and y
+    out.ravel()[:] = [coord for point in hand_landmarks.landmark for coord in (point.x, point.y)]
+    return out
+
+
+class GestureDetector:
+    def __init__(self, source=None, scheduler=None, resolution=(640, 480), roi=False, roi_size=256, roi_padding=0.25,
+                 smoothing=True, players=1, templates=None):
+        # Live camera by default, see frame_source for replay and synthetic backends.
+        # resolution: (width, height) frames are resized to for a full-frame search.
+        # roi: track the hand by searching a roi_size crop around its last position
+        # (padded by roi_padding of its size), full-frame search when it gets lost.
+        # smoothing: publish the GestureFilter's steady gesture and its confidence
+        # instead of each frame's classify_hand result.
+        # players: hands to track; with more than one, every hand in a frame goes to a
+        # player (see players.PlayerTracker) and each player's results to channels[player].
+        # ROI tracking follows a single hand, so it is only used with one player.
+        # templates: path of a gesture_templates index to classify hands with instead of
+        # classify_hand's finger rules (which never report "ok").
+        self.source = source if source is not None else CameraSource(0)
+        if scheduler is None:
+            # recordings are replayed unpaced, the live camera at the default rate
+            scheduler = PacingScheduler() if self.source.live else PacingScheduler(target_hz=None)
+        self.scheduler = scheduler
+        self.resolution = tuple(resolution)
+        self.players = players
+        self.roi_tracking = roi and players == 1
+        self.roi_size = roi_size
+        self.roi_padding = roi_padding
+        self.roi = None
+        self.roi_frames = 0
+        self.roi_lost = 0
+        self.templates = TemplateIndex.load(templates) if templates else None
+        self.filters = [GestureFilter(templates=self.templates) for _ in range(players)] if smoothing else None
+        self.tracker = PlayerTracker(players, LANDMARK_SPACE[0]) if players > 1 else None
+        self.hands = None
+        self.converter = FrameConverter()
+        self.points = np.empty((players, 21, 2), dtype=np.float32)  # reused by every MediaPipe pass
+        self.ready = threading.Event()  # set once the source is open and the model is built
+        self.active = threading.Event()  # cleared by pause()
+        self.active.set()
+        self.channels = [GestureChannel() for _ in range(players)]  # published results, see latest()
+        self.channel = self.channels[0]
+        self.landmarks = None            # hand found in the frame being processed
+        self.player_landmarks = [None] * players  # with several players, each one's hand
+        self.frames_processed = 0
+        self.running = False
+        self.thread = None
+
+    def load_model(self):
+        # Importing cv2 and MediaPipe and building Hands takes about a second, so
+        # start_detection() does it on the detector thread instead of at import
+        if self.hands is not None or self.source.provides_landmarks:
+            return
+        import mediapipe as mp
+        self.mp_hands = mp.solutions.hands
+        self.hands = self.mp_hands.Hands(
+            static_image_mode=False,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.5,
+            max_num_hands=self.players
+        )
+        self.mp_drawing = mp.solutions.drawing_utils
+
+    def warm_up(self):
+        # One inference on a blank frame, so MediaPipe's lazy graph setup doesn't land
+        # on the first real frame of a level
+        if self.hands is not None:
+            self.hands.process(np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8))
+
+    def process_frame(self, frame):
+        # Returns the gesture and sets self.landmarks to the (21, 2) hand or None.
+        # Landmarks are in LANDMARK_SPACE pixels whatever the inference resolution, so
+        # classify_hand's pixel tolerances keep their meaning. With smoothing the
+        # GestureFilter classifies, so the raw gesture is left at "None".
+        if self.source.provides_landmarks:
+            self.landmarks = frame
+            return self.classify(frame)
+
+        hand = None
+        if self.roi is not None:
+            # Only search where the hand was in the previous frame
+            self.roi_frames += 1
+            hand = self._detect(frame, self.roi)
+            if hand is None:
+                self.roi_lost += 1
+        if hand is None:
+            hand = self._detect(frame, None)
+        if self.roi_tracking:
+            self.roi = self._roi_around(hand, frame.shape[1], frame.shape[0]) if hand is not None else None
+
+        self.landmarks = hand
+        if hand is None:
+            return "None"
+        return self.classify(hand)
+
+    def classify(self, hand):
+        if self.filters is not None:
+            return "None"
+        with profiler.span("classify"):
+            if self.templates is not None:
+                return self.templates.classify(hand)[0]
+            return classify_hand(hand)
+
+    def process_players(self, frame):
+        # process_frame for several players: every hand found in one full-frame pass goes
+        # to its player and the hands are classified in one batch. Returns a gesture per
+        # player and sets self.player_landmarks; with smoothing the GestureFilters
+        # classify, so the raw gestures are left at "None".
+        if self.source.provides_landmarks:
+            found = [hand for hand in frame.reshape(-1, 21, 2) if not np.isnan(hand).any()]
+            handedness = None
+        else:
+            found, handedness = self._detect_hands(frame)
+        hands = self.tracker.assign(found, handedness)
+        self.player_landmarks = hands
+        gestures = ["None"] * self.players
+        present = [i for i, hand in enumerate(hands) if hand is not None]
+        if present and self.filters is None:
+            with profiler.span("classify"):
+                found = np.stack([hands[i] for i in present])
+                if self.templates is not None:
+                    codes, _ = self.templates.search(found)
+                else:
+                    codes = classify_batch_codes(found)
+            for i, code in zip(present, codes):
+                gestures[i] = GESTURES[code]
+        return gestures
+
+    def _infer(self, frame, size):
+        with profiler.span("resize"):
+            frame = self.converter.resize(frame, size)
+        with profiler.span("color_convert"):
+            rgb_frame = self.converter.rgb(frame)
+        with profiler.span("inference"):
+            return self.hands.process(rgb_frame)
+
+    def _detect_hands(self, frame):
+        # Every hand in the whole frame in LANDMARK_SPACE, and MediaPipe's handedness
+        # label ("Left"/"Right") of each
+        results = self._infer(frame, self.resolution)
+        if not results.multi_hand_landmarks:
+            return [], []
+        hands = []
+        for hand_landmarks, points in zip(results.multi_hand_landmarks, self.points):
+            points = read_landmarks(hand_landmarks, points)
+            points *= LANDMARK_SPACE
+            hands.append(np.trunc(points, out=points))
+        handedness = [hand.classification[0].label for hand in results.multi_handedness]
+        return hands, handedness
+
+    def _detect(self, frame, box):
+        # One MediaPipe pass over the whole frame (box=None) or the normalized
+        # (x0, y0, x1, y1) box, returns the landmarks in LANDMARK_SPACE or None
+        if box is None:
+            x0, y0, x1, y1 = 0.0, 0.0, 1.0, 1.0
+            size = self.resolution
+        else:
+            x0, y0, x1, y1 = box
+            height, width = frame.shape[:2]
+            frame = frame[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+            size = (self.roi_size, self.roi_size)
+        results = self._infer(frame, size)
+        if not results.multi_hand_landmarks:
+            return None
+
+        # self.points is overwritten by the next pass; publish() copies what it hands out
+        points = read_landmarks(results.multi_hand_landmarks[0], self.points[0])
+        points[:, 0] = (x0 + points[:, 0] * (x1 - x0)) * LANDMARK_SPACE[0]
+        points[:, 1] = (y0 + points[:, 1] * (y1 - y0)) * LANDMARK_SPACE[1]
+        return np.trunc(points, out=points)
+
+    def _roi_around(self, hand, width, height):
+        # Padded square around the hand in frame pixels, at least roi_size wide, kept
+        # inside the frame; returned normalized as (x0, y0, x1, y1)
+        points = hand * (width / LANDMARK_SPACE[0], height / LANDMARK_SPACE[1])
+        left, top = points.min(axis=0)
+        right, bottom = points.max(axis=0)
+        side = max(right - left, bottom - top) * (1 + 2 * self.roi_padding)
+        side = min(max(side, self.roi_size), width, height)
+        x0 = min(max((left + right - side) / 2, 0), width - side)
+        y0 = min(max((top + bottom - side) / 2, 0), height - side)
+        return (x0 / width, y0 / height, (x0 + side) / width, (y0 + side) / height)
+
+    def publish(self, gesture, capture_time, confidence=None, changed_time=None, landmarks=None, player=0):
+        if landmarks is not None:
+            landmarks = np.array(landmarks, dtype=np.float32)
+            landmarks.setflags(write=False)
+        self.channels[player].publish(GestureResult(self.frames_processed, capture_time, landmarks, gesture,
+                                                    confidence, changed_time))
+
+    def latest(self, player=0):
+        # Newest GestureResult, None before the first frame; read it once per game frame
+        # so gesture, landmarks and times all belong to the same camera frame
+        return self.channels[player].latest()
+
+    @property
+    def current_gesture(self):
+        result = self.channel.latest()
+        return result.gesture if result is not None else "None"
+
+    @property
+    def current_landmarks(self):
+        result = self.channel.latest()
+        return result.landmarks if result is not None else None
+
+    @property
+    def gesture_time(self):
+        # perf_counter() when the frame behind current_gesture was captured
+        result = self.channel.latest()
+        return result.capture_time if result is not None else None
+
+    def detect_loop(self):
+        scheduler = self.scheduler
+        scheduler.reset()
+        while self.running:
+            if not self.active.is_set():
+                # Paused: the camera stays open and the model loaded, nothing is processed
+                if self.active.wait(0.1):
+                    scheduler.reset()
+                    self.roi = None
+                    if self.tracker is not None:
+                        self.tracker.reset()
+                    for gesture_filter in self.filters or ():
+                        gesture_filter.reset()
+                continue
+            scheduler.wait()
+            read_start = time.perf_counter()
+            if self.source.live:
+                ret, frame, dropped = self.source.read_latest(scheduler.stale_after())
+                scheduler.frames_dropped(dropped)
+            else:
+                ret, frame = self.source.read()
+            if not ret:
+                scheduler.frame_skipped()
+                if self.source.finished:
+                    self.running = False
+                continue
+
+            capture_time = time.perf_counter()
+            profiler.record("capture", read_start, capture_time)
+            if self.tracker is None:
+                gestures = [self.process_frame(frame)]
+                hands = [self.landmarks]
+            else:
+                gestures = self.process_players(frame)
+                hands = self.player_landmarks
+            if self.filters is None:
+                results = [(gesture, None, None) for gesture in gestures]
+            else:
+                with profiler.span("filter"):
+                    if self.tracker is None:
+                        results = [self.filters[0].update(hands[0], capture_time)]
+                    else:
+                        results = update_filters(self.filters, hands, capture_time)
+            scheduler.frame_processed(time.perf_counter() - capture_time)
+            for player, (gesture, confidence, changed_time) in enumerate(results):
+                self.publish(gesture, capture_time, confidence, changed_time, hands[player], player)
+            self.frames_processed += 1
+        log.info("detector_stats", **{key: round(value, 1) for key, value in scheduler.stats().items()})
+
+    def _start_and_detect(self):
+        try:
+            self.load_model()
+            self.source.open()
+            self.warm_up()
+        except Exception as e:
+            log.error("detector_failed", error=repr(e))
+            self.running = False
+            self.source.release()
+            return
+        self.ready.set()
+        log.info("detector_ready")
+        self.detect_loop()
+
+    def start_detection(self):
+        # Returns at once; the source and the model are opened on the detector thread
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._start_and_detect)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def pause(self):
+        # Between levels: much cheaper than stop_detection(), resume() continues at once
+        self.active.clear()
+
+    def resume(self):
+        self.active.set()
+
+    def replay(self):
+        # Run the whole pipeline on a replay source in the calling thread, as fast as the
+        # source allows. Returns (frames, seconds).
+        self.load_model()
+        self.source.open()
+        self.running = True
+        self.frames_processed = 0
+        start = time.perf_counter()
+        self.detect_loop()
+        return self.frames_processed, time.perf_counter() - start
+
+    def stop_detection(self):
+        # Safe to call repeatedly; start_detection() reopens the source afterwards
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+        self.ready.clear()
+        self.source.release()
+        if "cv2" in sys.modules:
+            sys.modules["cv2"].destroyAllWindows()
@@ -0,0 +1,152 @@
+import math
+import time
+import numpy as np
+from gesture_identify import GESTURES, UNKNOWN, finger_margins, gesture_code
+from profiler import profiler
+
+# Filter outputs: the classify_hand labels plus "None" for frames without a hand
+LABELS = GESTURES + ("None",)
+NO_HAND = len(GESTURES)
+
+
+def _smoothing(cutoff, dt):
+    # Exponential smoothing factor of a first order low-pass filter at `cutoff` Hz
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class GestureFilter:
+    # Turns the detector's per-frame landmarks into a steady gesture.
+    #
+    #     gesture, confidence, changed_time = gesture_filter.update(landmarks, capture_time)
+    #
+    # Landmarks go through a One Euro filter (little smoothing while the hand moves fast,
+    # a lot while it is still), each finger only flips between curled and extended once
+    # it is `hysteresis` pixels past classify_hand's threshold, and every frame votes for
+    # its gesture in a score that decays with time constant `tau` seconds. The gesture
+    # with the highest score is published, its score is the confidence in [0, 1] and
+    # changed_time is the capture time at which it took the lead. Timing is in seconds
+    # of capture time, so it behaves the same at 10 Hz and at 30 Hz.
+    #
+    # With `templates` (a gesture_templates.TemplateIndex) the smoothed landmarks are
+    # matched against it instead and a frame the index is unsure of gives the rest of
+    # its vote to "unknown_gesture"; hysteresis is not used then.
+    def __init__(self, tau=0.1, hysteresis=8, min_cutoff=1.0, beta=0.02, derivative_cutoff=1.0, templates=None):
+        self.tau = tau
+        self.hysteresis = hysteresis
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.templates = templates
+        self.reset()
+
+    def reset(self):
+        self.points = None      # smoothed landmarks
+        self.velocity = None
+        self.extended = None    # per finger, thumb first
+        self.last_time = None
+        self.dt = 0.0
+        # a few numbers per frame: plain Python is faster than NumPy here
+        self.scores = [0.0] * len(LABELS)
+        self.scores[NO_HAND] = 1.0
+        self.code = NO_HAND
+        self.gesture = "None"
+        self.confidence = 1.0
+        self.changed_time = None
+
+    def smooth(self, landmarks, dt):
+        landmarks = np.asarray(landmarks, dtype=np.float64)
+        if self.points is None or dt <= 0:
+            # first frame of a hand: nothing to smooth against yet
+            self.points = landmarks.copy()
+            self.velocity = np.zeros_like(landmarks)
+            return self.points
+        change = landmarks - self.points
+        self.velocity += _smoothing(self.derivative_cutoff, dt) * (change / dt - self.velocity)
+        # per coordinate cutoff min_cutoff + beta * |velocity|, as a smoothing factor
+        tau = 1.0 / (2 * math.pi * (self.min_cutoff + self.beta * np.abs(self.velocity)))
+        self.points += change / (1.0 + tau / dt)
+        return self.points
+
+    def classify(self, points):
+        return self.classify_margins(finger_margins(points[np.newaxis])[0].tolist())
+
+    def classify_margins(self, margins):
+        if self.extended is None:
+            self.extended = [margin > 0 for margin in margins]
+        else:
+            # only decisions that are clearly past the threshold change a finger
+            for i, margin in enumerate(margins):
+                if margin > self.hysteresis:
+                    self.extended[i] = True
+                elif margin < -self.hysteresis:
+                    self.extended[i] = False
+        return gesture_code(self.extended)
+
+    def update(self, landmarks, capture_time):
+        # landmarks: (21, 2) pixels or None when no hand was found.
+        # Returns (gesture, confidence, changed_time).
+        points = self.prepare(landmarks, capture_time)
+        if points is None:
+            return self.vote(NO_HAND, capture_time)
+        # the detector's "classify" stage; smoothing and voting count towards "filter"
+        with profiler.span("classify"):
+            if self.templates is not None:
+                codes, certainties = self.templates.search(points)
+                code, certainty = int(codes[0]), float(certainties[0])
+            else:
+                code, certainty = self.classify(points), 1.0
+        return self.vote(code, capture_time, certainty)
+
+    def prepare(self, landmarks, capture_time):
+        # Smoothed landmarks to classify, None without a hand
+        # the first frame counts as much as one at a typical camera rate
+        self.dt = capture_time - self.last_time if self.last_time is not None else 1 / 30
+        self.last_time = capture_time
+        if landmarks is None:
+            # the hand has to be found again, start its smoothing from scratch
+            self.points = None
+            self.extended = None
+            return None
+        return self.smooth(landmarks, self.dt)
+
+    def vote(self, code, capture_time, certainty=1.0):
+        # every frame is worth the same share of the last `tau` seconds, whatever the rate;
+        # the part of it the classifier wasn't certain of goes to "unknown_gesture"
+        vote = 1.0 - math.exp(-max(self.dt, 0.0) / self.tau)
+        scores = self.scores
+        for i in range(len(scores)):
+            scores[i] *= 1.0 - vote
+        scores[code] += vote * certainty
+        scores[UNKNOWN] += vote * (1.0 - certainty)
+        best = max(range(len(scores)), key=scores.__getitem__)
+        if best != self.code:
+            self.code = best
+            self.gesture = LABELS[best]
+            self.changed_time = capture_time
+        self.confidence = scores[best]
+        return self.gesture, self.confidence, self.changed_time
+
+
+def update_filters(filters, hands, capture_time):
+    # GestureFilter.update for the hands of one frame, one filter per hand (or None),
+    # with the finger margins (or the template search) of all of them in one NumPy pass.
+    # The filters share their settings, templates included.
+    points = [gesture_filter.prepare(hand, capture_time) for gesture_filter, hand in zip(filters, hands)]
+    present = [i for i, hand in enumerate(points) if hand is not None]
+    codes = [NO_HAND] * len(filters)
+    certainties = [1.0] * len(filters)
+    if present:
+        classify_start = time.perf_counter()
+        stacked = np.stack([points[i] for i in present])
+        if filters[0].templates is not None:
+            found, found_certainties = filters[0].templates.search(stacked)
+            for i, code, certainty in zip(present, found.tolist(), found_certainties.tolist()):
+                codes[i], certainties[i] = code, certainty
+        else:
+            margins = finger_margins(stacked).tolist()
+            for i, hand_margins in zip(present, margins):
+                codes[i] = filters[i].classify_margins(hand_margins)
+        profiler.record("classify", classify_start, time.perf_counter())
+    return [gesture_filter.vote(code, capture_time, certainty)
+            for gesture_filter, code, certainty in zip(filters, codes, certainties)]
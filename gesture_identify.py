@@ -1,74 +1,102 @@
 import numpy as np
+from event_log import log
+
+# A broken frame would otherwise report the same error 30 times a second
+log.limit("gesture_error", per_second=1)
 
 def distance(p1, p2):
     return np.linalg.norm(np.array(p1) - np.array(p2))
 
+# MediaPipe hand landmark ids
+FINGER_TIPS = np.array([8, 12, 16, 20])   # index, middle, ring, pinky
+FINGER_PIPS = np.array([6, 10, 14, 18])
+THUMB_TIP = 4
+THUMB_IP = 3
+PIP_TOLERANCE = 20  # pixels, allow slight bending
+FINGER_JOINTS = tuple(zip(FINGER_TIPS.tolist(), FINGER_PIPS.tolist()))
+
+# Labels indexed by the codes returned from classify_batch; the rules below never
+# produce 'ok', the template classifier (gesture_templates.py) does
+GESTURES = ('unknown_gesture', 'fist', 'scissor', 'paper', 'ok')
+UNKNOWN, FIST, SCISSOR, PAPER, OK = range(5)
+
+def classify_batch_codes(points):
+    # points: (N, 21, 2) array of pixel (x, y) per landmark id
+    points = np.asarray(points)
+    if points.ndim != 3 or points.shape[1:] != (21, 2):
+        raise ValueError(f"expected an (N, 21, 2) landmark array, got {points.shape}")
+
+    # For right hand: thumb is extended when tip is to the right of IP joint (higher x coordinate)
+    thumb = points[:, THUMB_TIP, 0] > points[:, THUMB_IP, 0]
+    # Finger extended: tip y coordinate less than PIP joint y coordinate, with tolerance
+    fingers = points[:, FINGER_TIPS, 1] < points[:, FINGER_PIPS, 1] + PIP_TOLERANCE
+
+    num_extended = thumb + fingers.sum(axis=1)
+    index_and_middle = fingers[:, 0] & fingers[:, 1]
+    return _GESTURE_TABLE[num_extended, index_and_middle.astype(np.intp)]
+
+def finger_margins(points):
+    # (N, 21, 2) -> (N, 5) pixels each finger is past the threshold above, thumb first;
+    # positive means extended. gesture_filter applies hysteresis to these.
+    margins = np.empty((len(points), 5), dtype=np.float32)
+    margins[:, 0] = points[:, THUMB_TIP, 0] - points[:, THUMB_IP, 0]
+    margins[:, 1:] = points[:, FINGER_PIPS, 1] + PIP_TOLERANCE - points[:, FINGER_TIPS, 1]
+    return margins
+
+def gesture_code(extended):
+    # five extended flags, thumb first -> gesture code
+    return int(_GESTURE_TABLE[sum(extended), int(extended[1] and extended[2])])
+
+def _build_gesture_table():
+    # gesture code for every (number of extended fingers, index and middle extended) pair,
+    # following the original rule order
+    table = np.full((6, 2), UNKNOWN, dtype=np.int8)
+    for num_extended in range(6):
+        for index_and_middle in (0, 1):
+            # Rock (fist): 0-1 fingers extended
+            if num_extended <= 1:
+                code = FIST
+            # Scissors: 2-3 fingers extended, including index and middle
+            elif 2 <= num_extended <= 3 and index_and_middle:
+                code = SCISSOR
+            # Paper: 3 or more fingers extended
+            elif num_extended >= 3:
+                code = PAPER
+            else:
+                code = UNKNOWN
+            table[num_extended, index_and_middle] = code
+    return table
+
+_GESTURE_TABLE = _build_gesture_table()
+
+def classify_batch(points):
+    return [GESTURES[c] for c in classify_batch_codes(points)]
+
+def landmarks_to_array(landmarks):
+    # [[id, x, y], ...] -> (21, 2) array ordered by landmark id
+    points = np.zeros((21, 2), dtype=np.float32)
+    for lm in landmarks:
+        points[lm[0]] = (lm[1], lm[2])
+    return points
+
 def classify_hand(landmarks):
 
-    if not landmarks or len(landmarks) < 21:
+    if landmarks is None or len(landmarks) < 21:
         return 'unknown_gesture'
-    
-    try:
 
-        points = {lm[0]: (lm[1], lm[2]) for lm in landmarks}
-        
-        finger_tips = {
-            'thumb': 4,
-            'index': 8,
-            'middle': 12,
-            'ring': 16,
-            'pinky': 20
-        }
-        
-        finger_pips = {
-            'thumb': 2,
-            'index': 6,
-            'middle': 10,
-            'ring': 14,
-            'pinky': 18
-        }
-        
-        extended_fingers = []
-        
-        thumb_tip = points.get(4)
-        thumb_ip = points.get(3)
-        if thumb_tip and thumb_ip:
-            # For right hand: thumb is extended when tip is to the right of IP joint (higher x coordinate)
-            if thumb_tip[0] > thumb_ip[0]:
-                extended_fingers.append('thumb')
-        
-        # Check if the other four fingers are extended (tip above PIP joint)
-        for finger, tip_id in finger_tips.items():
-            if finger == 'thumb':
-                continue
-                
-            pip_id = finger_pips[finger]
-            tip = points.get(tip_id)
-            pip = points.get(pip_id)
-            
-            if tip and pip:
-                # Finger extended: tip y coordinate less than PIP joint y coordinate
-                # Relaxed condition: allow slight bending
-                if tip[1] < pip[1] + 20:  # Add 20 pixel tolerance
-                    extended_fingers.append(finger)
-        
-        # Classify gesture based on extended fingers (more lenient logic)
-        num_extended = len(extended_fingers)
-        
-        # Rock (fist): 0-1 fingers extended
-        if num_extended <= 1:
-            return 'fist'
-        # Scissors: 2-3 fingers extended, including index and middle
-        elif 2 <= num_extended <= 3 and 'index' in extended_fingers and 'middle' in extended_fingers:
-            return 'scissor'
-        # Paper: 3 or more fingers extended
-        elif num_extended >= 3:
-            return 'paper'
+    try:
+        # One hand in plain Python: NumPy's per-call overhead costs more than the few
+        # comparisons, the rules and their table are the same as classify_batch_codes'
+        if isinstance(landmarks, np.ndarray) and landmarks.shape == (21, 2):
+            points = landmarks.tolist()
         else:
-            return 'unknown_gesture'
-            
+            points = {lm[0]: (lm[1], lm[2]) for lm in landmarks}
+        extended = [points[THUMB_TIP][0] > points[THUMB_IP][0]]
+        extended += [points[tip][1] < points[pip][1] + PIP_TOLERANCE for tip, pip in FINGER_JOINTS]
+        return GESTURES[gesture_code(extended)]
+
     except Exception as e:
-        print(f"Gesture recognition error: {e}")
+        log.warning("gesture_error", error=repr(e))
         return 'unknown_gesture'
 
 # Test function
@@ -0,0 +1,186 @@
+import os
+import sys
+import numpy as np
+from gesture_identify import GESTURES, UNKNOWN
+
+# Bump when normalize() or the file layout changes, so old indexes are rebuilt
+INDEX_VERSION = 1
+
+WRIST, MIDDLE_MCP, INDEX_MCP, PINKY_MCP = 0, 9, 5, 17
+
+
+def normalize(points):
+    # (N, 21, 2) or (21, 2) landmarks -> (N, 42) vectors that don't depend on where the
+    # hand is, how big it is, which hand it is or how it is tilted: the wrist goes to the
+    # origin, the wrist -> middle finger base line becomes one unit long pointing up, and
+    # a hand whose index finger base is on the other side of the pinky's is mirrored.
+    # As complex numbers x + yj, moving, scaling and turning a hand is one division.
+    points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 21, 2)
+    z = points.view(np.complex64)[:, :, 0]
+    z = z - z[:, WRIST:WRIST + 1]
+    up = z[:, MIDDLE_MCP:MIDDLE_MCP + 1]
+    z *= np.complex64(-1j) / np.where(up == 0, 1, up)   # up becomes (0, -1), the image's up
+    # a right hand facing the camera has its index finger base left of the pinky's
+    mirrored = z[:, INDEX_MCP].real > z[:, PINKY_MCP].real
+    z[mirrored] = -z[mirrored].conj()   # x -> -x
+    return z.view(np.float32)
+
+
+class TemplateIndex:
+    # Labeled hands, normalized once and kept as one (M, 42) array, matched by k nearest
+    # neighbours. Unlike classify_hand it works for either hand at any size and distance
+    # and knows every gesture it has templates of, "ok" included.
+    #
+    #     index = TemplateIndex.load(config.GestureIndexPath)
+    #     gesture, confidence = index.classify(landmarks)       # one (21, 2) hand
+    #     codes, confidences = index.search(hands)              # (N, 21, 2), GESTURES codes
+    #
+    # The k nearest templates vote, weighted by 1 / distance. The confidence is the
+    # winner's share of the vote times 1 - (d / reject_distance)^2, d being the distance
+    # to its nearest template; a hand further than reject_distance from every template
+    # is "unknown_gesture".
+    def __init__(self, vectors, labels, k=5, reject_distance=1.0):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.intp)   # GESTURES codes
+        if len(self.vectors) == 0 or self.vectors.shape[1:] != (42,) or len(self.labels) != len(self.vectors):
+            raise ValueError(f"expected (M, 42) templates and M labels, got {self.vectors.shape} and {self.labels.shape}")
+        self.k = min(k, len(self.vectors))
+        self.reject_distance = float(reject_distance)
+        self.squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.one_hot = np.eye(len(GESTURES), dtype=np.float32)[self.labels]  # (M, gestures)
+
+    def search(self, points):
+        # (N, 21, 2) -> GESTURES codes and confidences in [0, 1], both (N,)
+        x = normalize(points)
+        # |x - t|^2 = |x|^2 + |t|^2 - 2 x.t for every template at once
+        distances = self.squared_norms - 2 * (x @ self.vectors.T)
+        rows = np.arange(len(x))[:, None]
+        if self.k < len(self.vectors):
+            nearest = np.argpartition(distances, self.k - 1, axis=1)[:, :self.k]
+        else:
+            nearest = np.broadcast_to(np.arange(self.k), (len(x), self.k))
+        distances = np.sqrt(np.maximum(distances[rows, nearest] + np.einsum("ij,ij->i", x, x)[:, None], 0))
+        weights = 1.0 / (distances + 1e-3)
+        votes = np.einsum("nk,nkg->ng", weights, self.one_hot[nearest])
+        codes = votes.argmax(axis=1)
+        share = votes[rows[:, 0], codes] / votes.sum(axis=1)
+        # the closest template of the winning gesture
+        closest = np.where(self.labels[nearest] == codes[:, None], distances, np.inf).min(axis=1)
+        confidences = share * np.maximum(1 - (closest / self.reject_distance) ** 2, 0)
+        codes[closest > self.reject_distance] = UNKNOWN
+        return codes, confidences
+
+    def classify(self, landmarks):
+        # One (21, 2) hand -> (gesture label, confidence)
+        codes, confidences = self.search(landmarks)
+        return GESTURES[codes[0]], float(confidences[0])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        names = np.array(GESTURES)
+        np.savez(path, version=INDEX_VERSION, vectors=self.vectors, labels=names[self.labels], k=self.k,
+                 reject_distance=self.reject_distance)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            if int(stored["version"]) != INDEX_VERSION:
+                raise ValueError(f"{path}: template index version {int(stored['version'])}, expected {INDEX_VERSION}; "
+                                 f"rebuild it with `python gesture_templates.py build`")
+            unknown = set(stored["labels"].tolist()) - set(GESTURES)
+            if unknown:
+                raise ValueError(f"{path}: unknown gestures {sorted(unknown)}")
+            labels = [GESTURES.index(name) for name in stored["labels"].tolist()]
+            return cls(stored["vectors"], labels, int(stored["k"]), float(stored["reject_distance"]))
+
+
+def build_index(hands, labels, k=5, spacing=0.05, per_gesture=200):
+    # TemplateIndex from labeled (N, 21, 2) hands. Near duplicates (closer than `spacing`
+    # to a kept template of the same gesture, e.g. consecutive camera frames) are
+    # dropped and at most `per_gesture` templates are kept of each. reject_distance is
+    # the typical distance from a template to the nearest one of another gesture: a hand
+    # that far from every template doesn't look like any of them.
+    vectors = normalize(hands)
+    labels = np.asarray(labels, dtype=np.intp)
+    kept = []
+    for code in np.unique(labels):
+        chosen = []
+        for i in np.flatnonzero(labels == code):
+            if len(chosen) == per_gesture:
+                break
+            if not chosen or np.min(np.linalg.norm(vectors[chosen] - vectors[i], axis=1)) >= spacing:
+                chosen.append(i)
+        kept += chosen
+    vectors, labels = vectors[kept], labels[kept]
+    squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+    distances = np.sqrt(np.maximum(squared_norms[:, None] + squared_norms - 2 * (vectors @ vectors.T), 0))
+    # nearest template of another gesture
+    distances[labels[:, None] == labels] = np.inf
+    nearest = distances.min(axis=1)
+    reject_distance = float(np.median(nearest[np.isfinite(nearest)])) if np.isfinite(nearest).any() else 1.0
+    return TemplateIndex(vectors, labels, k, max(reject_distance, spacing))
+
+
+def synthetic_templates(count=60, seed=0, jitter=(1.0, 6.0)):
+    # (hands, labels) of frame_source.synthetic_hand for every gesture, jittered (pixels,
+    # drawn from the `jitter` range per hand), scaled, tilted and mirrored, to start an
+    # index before there are recordings of real hands
+    from frame_source import synthetic_hand
+    rng = np.random.default_rng(seed)
+    hands, labels = [], []
+    for code, gesture in enumerate(GESTURES):
+        if code == UNKNOWN:
+            continue
+        for _ in range(count):
+            hand = synthetic_hand(gesture, rng, jitter=rng.uniform(*jitter))
+            angle = rng.uniform(-0.4, 0.4)
+            rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+            hand = (hand - hand[WRIST]) @ rotation * rng.uniform(0.5, 1.5) + rng.uniform((100, 150), (540, 400))
+            if rng.random() < 0.5:
+                hand[:, 0] = 640 - hand[:, 0]
+            hands.append(hand)
+            labels.append(code)
+    return np.array(hands, dtype=np.float32), labels
+
+
+def read_templates(spec):
+    # (hands, labels) from one build argument:
+    #   session.hfs         the hands of a recording, labeled as the game recognised them
+    #   <gesture>=file      every hand in a recording (.hfs) or landmark stream (.npy)
+    #                       is that gesture, e.g. ok=sessions/ok.hfs
+    #   synthetic           synthetic_templates()
+    from session_record import SessionReader, LANDMARKS, HAND
+    if spec == "synthetic":
+        return synthetic_templates()
+    gesture, _, path = spec.rpartition("=")
+    if gesture and gesture not in GESTURES:
+        raise ValueError(f"unknown gesture {gesture!r}, expected one of {GESTURES[1:]}")
+    if path.endswith(".npy"):
+        if not gesture:
+            raise ValueError(f"{path}: a landmark stream needs a gesture, e.g. ok={path}")
+        hands = np.load(path).reshape(-1, 21, 2)
+        return hands, [GESTURES.index(gesture)] * len(hands)
+    reader = SessionReader(path)
+    records = reader.of_kind(LANDMARKS)
+    records = records[(records["flags"] & HAND) != 0]
+    if gesture:
+        return reader.hands[records["hand"]], [GESTURES.index(gesture)] * len(records)
+    records = records[records["code"] > UNKNOWN]
+    return reader.hands[records["hand"]], records["code"].tolist()
+
+
+if __name__ == "__main__":
+    # python gesture_templates.py build models/gestures.npz sessions/level1-....hfs ok=sessions/ok.hfs synthetic
+    if len(sys.argv) < 4 or sys.argv[1] != "build":
+        print("usage: python gesture_templates.py build <index.npz> <session.hfs | gesture=file.hfs|.npy | synthetic>...")
+        sys.exit(1)
+    hands, labels = [], []
+    for spec in sys.argv[3:]:
+        spec_hands, spec_labels = read_templates(spec)
+        hands.append(np.asarray(spec_hands, dtype=np.float32).reshape(-1, 21, 2))
+        labels += list(spec_labels)
+        print(f"{spec}: {len(spec_labels)} hands")
+    index = build_index(np.concatenate(hands), labels)
+    index.save(sys.argv[2])
+    counts = {GESTURES[code]: int(count) for code, count in zip(*np.unique(index.labels, return_counts=True))}
+    print(f"{sys.argv[2]}: {len(index.vectors)} templates {counts}, reject distance {index.reject_distance:.3f}")
@@ -2,7 +2,13 @@
 import mediapipe
 import cv2
 import time
+import sys
+import numpy as np
 from gesture_identify import classify_hand
+from frame_source import open_source, FrameConverter
+from gesture_detector import read_landmarks
+from profiler import profiler
+from event_log import log, DEBUG
 
 #Use MediaPipe to draw the hand framework over the top of hands it identifies in Real-Time
 drawingModule = mediapipe.solutions.drawing_utils
@@ -10,8 +16,19 @@ handsModule = mediapipe.solutions.hands
 w = 640
 h = 480
 
+#Landmark output goes through the background event log, a few times per second at most
+log.configure(level=DEBUG, console_level=DEBUG)
+log.limit("gesture", per_second=5)
+log.limit("landmarks", per_second=2)
+log.limit("fingertips", per_second=2)
+
 #Use CV2 Functionality to create a Video stream and add some values
-cap = cv2.VideoCapture(0)
+#Pass a video file or a directory of images to replay a recording instead of the camera
+cap = open_source(sys.argv[1] if len(sys.argv) > 1 else 0, realtime=True)
+
+#Resized and RGB frames and the landmarks are written into the same arrays every frame
+converter = FrameConverter()
+points = np.empty((21, 2), dtype=np.float32)
 
 #Add confidence values and extra settings to MediaPipe hand tracking. As we are using a live video stream this is not a static
 #image mode, confidence values in regards to overall detection and tracking and we will only let two hands be tracked at the same time
@@ -29,53 +46,60 @@ with handsModule.Hands(static_image_mode=False, min_detection_confidence=0.5, mi
 #Create an infinite loop which will produce the live feed to our desktop and that will search for hands
      while True:
            ret, frame = cap.read()
-           cap.set(cv2.CAP_PROP_BUFFERSIZE,1)
-           start =time.time()
+           if not ret:
+               if cap.finished:
+                   break
+               continue
+           start = time.perf_counter()
            #Unedit the below line if your live feed is produced upsidedown
            #flipped = cv2.flip(frame, flipCode = -1)
            
            #Determines the frame size, 640 x 480 offers a nice balance between speed and accurate identification
-           frame1 = cv2.resize(frame, (640, 480))
+           frame1 = converter.resize(frame, (w, h))
            
            #produces the hand framework overlay ontop of the hand, you can choose the colour here too)
-           results = hands.process(cv2.cvtColor(frame1, cv2.COLOR_BGR2RGB))
+           results = hands.process(converter.rgb(frame1))
            
            #Incase the system sees multiple hands this if statment deals with that and produces another hand overlay
            if results.multi_hand_landmarks != None:
                for handLandmarks in results.multi_hand_landmarks:
                     drawingModule.draw_landmarks(frame1, handLandmarks, handsModule.HAND_CONNECTIONS)
                     
-                    landmarks = []
-                    for id, pt in enumerate (handLandmarks.landmark):
-                        x = int(pt.x * w)
-                        y = int(pt.y * h)
-                        landmarks.append([id, x, y])
+                    landmarks = read_landmarks(handLandmarks, points)
+                    landmarks *= (w, h)
+                    np.trunc(landmarks, out=landmarks)
                     
                     gesture = classify_hand(landmarks)
                     
                     cv2.putText(frame1, f"Gesture: {gesture}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
                     
-                    print(f"Gesture: {gesture}")
-                    
-                    for val in landmarks:
-                        if (val[0] < 6):
-                            print(val)
+                    log.debug("gesture", gesture=gesture)
+                    log.debug("landmarks", points=landmarks[:6].astype(int).tolist())
                     
+                    fingertips = {}
                     for point in handsModule.HandLandmark:
-                        normalizedLandmark = handLandmarks.landmark[point]
-                        pixelCoordinatesLandmark = drawingModule._normalized_to_pixel_coordinates(normalizedLandmark.x, normalizedLandmark.y, 640, 480)
-                        
                         if point in finger_names:
-                            print(f"{finger_names[point]}: {pixelCoordinatesLandmark}")
+                            normalizedLandmark = handLandmarks.landmark[point]
+                            fingertips[finger_names[point]] = drawingModule._normalized_to_pixel_coordinates(normalizedLandmark.x, normalizedLandmark.y, 640, 480)
+                    log.debug("fingertips", **fingertips)
                     
             
+           #Median processing time of the recent frames
+           frame_ms = profiler.percentiles("frame", (50,))
+           if frame_ms is not None:
+               cv2.putText(frame1, f"{frame_ms[0]:.1f} ms/frame", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+
            #Below shows the current frame to the desktop 
            cv2.imshow("Frame", frame1)
            key = cv2.waitKey(1) & 0xFF
            
-           end = time.time()
+           end = time.perf_counter()
+           profiler.record("frame", start, end)
            if key == ord('q'):
                break
 
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
+log.close()
+for stage, stats in profiler.summary().items():
+    print(f"{stage}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms")
\ No newline at end of file
@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import bisect
+from multiprocessing import Pool
+import numpy as np
+
+# Nothing here opens a window, but pygame is still imported through level.py
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import config
+from level import LEVELS, LevelSession
+from event_log import log
+from session_record import replay_session
+from gesture_filter import GestureFilter
+from gesture_templates import TemplateIndex
+from frame_source import synthetic_hand
+
+config.Headless = True
+
+
+class GestureScript:
+    # What the player shows over time: (ms, classify_hand label) changes, plus keyboard
+    # presses for gestures the camera can't see
+    def __init__(self, changes, keys=()):
+        self.times = [t for t, _ in changes]
+        self.labels = [label for _, label in changes]
+        self.keys = list(keys)
+
+    def label_at(self, t):
+        i = bisect.bisect_right(self.times, t) - 1
+        return self.labels[i] if i >= 0 else "None"
+
+
+class HitLog:
+    # LevelSession recorder that keeps the judgements of one run
+    def __init__(self):
+        self.hits = []
+
+    def spawn(self, sim_time, kind):
+        pass
+
+    def hit(self, sim_time, kind, correct):
+        self.hits.append((sim_time, kind, correct))
+
+    def key(self, sim_time, gesture):
+        pass
+
+
+_judgements = {}
+
+def judgement_times(level):
+    # (ms, prompt kind) of every judgement; they only depend on the schedule, so one
+    # run where nobody can win or lose gives all of them
+    if level.name not in _judgements:
+        hits = HitLog()
+        session = LevelSession(level, recorder=hits)
+        session.health = session.enemy_health = len(level.schedule) + 1
+        sim_time = 0
+        while session.spawn_index < len(level.schedule) or len(session.prompts) or session.pending:
+            sim_time += level.update_freq
+            session.step(sim_time)
+            session.observe("None")
+        _judgements[level.name] = [(t, kind) for t, kind, _ in hits.hits]
+    return _judgements[level.name]
+
+
+class SimulatedPlayer:
+    # A player who turns to the next prompt once the previous one was judged (or it
+    # appeared), reacts after a normally distributed delay and shows the wrong
+    # gesture with probability 1 - accuracy
+    def __init__(self, reaction_ms=450, reaction_sd=120, accuracy=0.95):
+        self.reaction_ms = reaction_ms
+        self.reaction_sd = reaction_sd
+        self.accuracy = accuracy
+
+    def script(self, level, rng):
+        labels = {gesture: label for label, gesture in level.gestures.items()}
+        spawns = {}
+        for spawn_time, kind in level.entries():
+            spawns.setdefault(kind, []).append(spawn_time)
+        changes, keys = [], []
+        previous = 0
+        for judged, kind in judgement_times(level):
+            seen = max(previous, spawns[kind].pop(0))
+            react = seen + max(100.0, rng.normal(self.reaction_ms, self.reaction_sd))
+            gesture = level.prompts[kind]
+            if rng.random() > self.accuracy:
+                gesture = rng.choice([g for g in set(level.prompts.values()) if g != gesture])
+            if gesture in labels:
+                changes.append((react, labels[gesture]))
+            else:
+                keys.append((react, gesture))
+            previous = judged
+        changes.sort()
+        keys.sort()
+        return GestureScript(changes, keys)
+
+
+def simulate(level, script, fps=config.FPS, detector_hz=config.DetectorTargetHz, latency_ms=50,
+             noise=0.02, jitter=4.0, smoothing=config.DetectorSmoothing, seed=0):
+    # Plays one level against a gesture script the way run_level does: frames at `fps`,
+    # each one stepping the simulation and reading the detector, which samples the
+    # script `detector_hz` times a second, `latency_ms` late, and misreads a sample
+    # with probability `noise`. With smoothing the samples become synthetic hands with
+    # `jitter` px landmark noise that go through a GestureFilter, as in the detector,
+    # classified the way config.GestureClassifier says. Returns (session, hits, sim ms).
+    rng = np.random.default_rng(seed)
+    gesture_filter = None
+    if smoothing:
+        templates = TemplateIndex.load(config.GestureIndexPath) if config.GestureClassifier == "templates" else None
+        gesture_filter = GestureFilter(templates=templates)
+    confidence = None
+    hits = HitLog()
+    session = LevelSession(level, recorder=hits)
+    frame_ms = 1000 / fps
+    period = 1000 / detector_hz
+    step = level.update_freq
+    end = judgement_times(level)[-1][0] + step
+    next_step = step
+    sample = None
+    seen_at = None
+    detected = "None"
+    key_index = 0
+    t = 0.0
+    while session.result is None and t <= end:
+        t += frame_ms
+        while next_step <= t and session.result is None:
+            session.step(next_step)
+            next_step += step
+        if session.result is not None:
+            break
+        current = int((t - latency_ms) // period)
+        if current != sample:
+            sample = current
+            seen_at = current * period
+            detected = "unknown_gesture" if rng.random() < noise else script.label_at(current * period)
+            if gesture_filter is not None:
+                hand = synthetic_hand(detected, rng, jitter) if detected != "None" else None
+                detected, confidence, _ = gesture_filter.update(hand, current * period / 1000)
+        session.observe(detected, None, confidence, seen_at)
+        while key_index < len(script.keys) and script.keys[key_index][0] <= t:
+            session.key(script.keys[key_index][1])
+            key_index += 1
+    return session, hits.hits, t
+
+
+RESULT_CODES = {"win": 0, "lose": 1, None: 2}
+
+def _run_batch(args):
+    number, seeds, player = args
+    level = LEVELS[number]
+    count = len(judgement_times(level))
+    results = np.zeros(len(seeds), dtype=np.int8)
+    health = np.zeros(len(seeds), dtype=np.int16)
+    correct = np.zeros(len(seeds), dtype=np.int16)
+    judged = np.zeros(len(seeds), dtype=np.int16)
+    duration = np.zeros(len(seeds), dtype=np.float32)
+    missed = np.zeros(count, dtype=np.int32)    # per judgement, how often it went wrong
+    reached = np.zeros(count, dtype=np.int32)   # and how often the game got that far
+    start = time.perf_counter()
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        session, hits, sim_ms = simulate(level, player.script(level, rng), seed=seed)
+        results[i] = RESULT_CODES[session.result]
+        health[i] = session.health
+        judged[i] = len(hits)
+        correct[i] = sum(hit[2] for hit in hits)
+        duration[i] = sim_ms
+        reached[:len(hits)] += 1
+        for j, hit in enumerate(hits):
+            missed[j] += not hit[2]
+    return number, results, health, correct, judged, duration, missed, reached, time.perf_counter() - start
+
+
+def _init_worker():
+    log.configure(level="warning")
+
+
+def balance(levels=(1, 2, 3, 4), sessions=1000, player=None, workers=None, batch=100):
+    # Simulates `sessions` plays of every level across a process pool, returns
+    # {level number: stats}
+    player = player or SimulatedPlayer()
+    tasks = [
+        (number, list(range(first, min(first + batch, sessions))), player)
+        for number in levels for first in range(0, sessions, batch)
+    ]
+    parts = {number: [] for number in levels}
+    start = time.perf_counter()
+    with Pool(workers, initializer=_init_worker) as pool:
+        for part in pool.imap_unordered(_run_batch, tasks):
+            parts[part[0]].append(part[1:])
+    wall = time.perf_counter() - start
+
+    stats = {}
+    for number in levels:
+        results, health, correct, judged, duration, missed, reached, cpu = zip(*parts[number])
+        results = np.concatenate(results)
+        health = np.concatenate(health)
+        correct = np.concatenate(correct)
+        judged = np.concatenate(judged)
+        missed = np.sum(missed, axis=0)
+        reached = np.sum(reached, axis=0)
+        times = [t for t, _ in judgement_times(LEVELS[number])]
+        windows = np.diff([0] + times)  # ms between consecutive judgements
+        miss_rate = missed / np.maximum(reached, 1)
+        hardest = np.argsort(miss_rate)[::-1][:3]
+        won = results == RESULT_CODES["win"]
+        stats[number] = {
+            "sessions": len(results),
+            "win_rate": float(won.mean()),
+            "lose_rate": float((results == RESULT_CODES["lose"]).mean()),
+            "unfinished_rate": float((results == RESULT_CODES[None]).mean()),
+            "health_left_on_win": float(health[won].mean()) if won.any() else None,
+            "accuracy": float(correct.sum() / max(judged.sum(), 1)),
+            "duration_s": float(np.concatenate(duration).mean() / 1000),
+            "window_min_ms": int(windows.min()),
+            "window_p50_ms": float(np.median(windows)),
+            "hardest": [(int(times[j]), int(windows[j]), float(miss_rate[j])) for j in hardest],
+            "ms_per_session": float(sum(cpu) * 1000 / len(results)),
+        }
+    stats["wall_s"] = wall
+    return stats
+
+
+def print_stats(stats):
+    for number, level_stats in stats.items():
+        if number == "wall_s":
+            continue
+        print(f"{LEVELS[number].name}:")
+        for key, value in level_stats.items():
+            if key == "hardest":
+                value = ", ".join(f"{t / 1000:.1f}s window {w}ms miss {rate:.0%}" for t, w, rate in value)
+            elif isinstance(value, float):
+                value = f"{value:.3f}"
+            print(f"  {key}: {value}")
+    print(f"wall time: {stats['wall_s']:.2f} s")
+
+
+def _replay(path):
+    return path, replay_session(path)
+
+
+if __name__ == "__main__":
+    # python headless.py [sessions=1000] [levels=1,2,3,4] [workers=N] [reaction=450] [accuracy=0.95]
+    # python headless.py replay sessions/*.hfs
+    _init_worker()
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        with Pool(initializer=_init_worker) as pool:
+            for path, result in pool.imap(_replay, sys.argv[2:]):
+                print(f"{path}: {result['result']} health={result['health']} enemy_health={result['enemy_health']} "
+                      f"correct={result['correct']}/{result['hits']} mismatches={result['hit_mismatches']}")
+        sys.exit(0)
+
+    options = dict(arg.split("=", 1) for arg in sys.argv[1:])
+    player = SimulatedPlayer(
+        reaction_ms=float(options.get("reaction", 450)),
+        accuracy=float(options.get("accuracy", 0.95)),
+    )
+    print_stats(balance(
+        levels=[int(n) for n in options.get("levels", "1,2,3,4").split(",")],
+        sessions=int(options.get("sessions", 1000)),
+        player=player,
+        workers=int(options["workers"]) if "workers" in options else None,
+    ))
@@ -0,0 +1,89 @@
+import bisect
+import statistics
+import config
+
+
+class GestureHistory:
+    # The gestures a level took recently, as the game times (ms) at which they changed.
+    # Camera gestures are keyed by when the camera captured them rather than when the
+    # game got them, so they can arrive late and out of order; an entry holds until the
+    # next one.
+    def __init__(self):
+        self.times = []
+        self.gestures = []
+
+    def add(self, t, gesture):
+        i = bisect.bisect_right(self.times, t)
+        if i > 0 and self.gestures[i - 1] == gesture:
+            return
+        self.times.insert(i, t)
+        self.gestures.insert(i, gesture)
+
+    def at(self, t):
+        i = bisect.bisect_right(self.times, t) - 1
+        return self.gestures[i] if i >= 0 else "None"
+
+    def shown_between(self, start, end):
+        # Every gesture held at some point from start to end, in order
+        first = bisect.bisect_right(self.times, start) - 1
+        last = bisect.bisect_right(self.times, end)
+        shown = self.gestures[max(first, 0):last]
+        return ["None"] + shown if first < 0 else shown
+
+    def forget(self, before):
+        # Drop what can't matter any more, keeping the gesture held at `before`
+        i = bisect.bisect_right(self.times, before) - 1
+        if i > 0:
+            del self.times[:i]
+            del self.gestures[:i]
+
+
+class LatencyCalibration:
+    # Measures the latency that capture timestamps don't cover (camera exposure and
+    # buffering, the display, gesture smoothing). The player switches gesture on every
+    # beat of a steady flash; since a steady beat is anticipated, not reacted to, the
+    # median delay from a beat to the capture time at which the new gesture was taken
+    # leaves out human reaction time. Times are in ms on any common clock.
+    def __init__(self, gestures, interval_ms=1000, confidence=config.GestureConfidence):
+        self.gestures = gestures        # classify_hand labels that count as an answer
+        self.interval_ms = interval_ms
+        self.confidence = confidence
+        self.beats = []
+        self.changes = []
+        self.gesture = "None"
+
+    def beat(self, t):
+        self.beats.append(t)
+
+    def observe(self, gesture, seen_at, confidence=None):
+        # Same rule as LevelSession.observe: a gesture counts once it is confident
+        if confidence is not None and self.confidence is not None and confidence < self.confidence:
+            return
+        # losing the hand or an unknown pose in between is not a change
+        if gesture in self.gestures and gesture != self.gesture:
+            self.gesture = gesture
+            self.changes.append(seen_at)
+
+    def latency(self):
+        # Median beat -> change delay in ms, None when fewer than half the beats got an answer
+        delays = []
+        for beat in self.beats:
+            near = [change - beat for change in self.changes if abs(change - beat) <= self.interval_ms / 2]
+            if near:
+                delays.append(min(near, key=abs))
+        if not delays or len(delays) < len(self.beats) / 2:
+            return None
+        return round(statistics.median(delays))
+
+
+def load_latency():
+    try:
+        with open(config.CalibrationPath, "r") as file:
+            return int(file.read())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def save_latency(latency):
+    with open(config.CalibrationPath, "w") as file:
+        file.write(str(latency))
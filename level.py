@@ -0,0 +1,199 @@
+import time
+import numpy as np
+import pygame
+import config
+from prompt_store import PromptStore
+from profiler import profiler
+from event_log import log
+from judgement import GestureHistory
+
+# Prompt kind -> gesture the player has to show when it reaches the hit line
+DEFAULT_PROMPTS = {"sword": "Sword", "fist": "Fist", "shield": "Shield"}
+
+# classify_hand label -> game gesture
+DEFAULT_GESTURES = {"scissor": "Sword", "fist": "Fist", "paper": "Shield"}
+
+# Keyboard fallback when the camera is not available
+DEFAULT_KEYS = {pygame.K_s: "Sword", pygame.K_f: "Fist", pygame.K_h: "Shield"}
+
+
+# One spawn: milliseconds since the level started and the prompt's index in level.kinds
+SCHEDULE_DTYPE = np.dtype([("time", np.int32), ("prompt", np.uint8)])
+
+
+def compile_schedule(recipe, kinds):
+    # [["sword", 4], ...] -> time sorted SCHEDULE_DTYPE array, times in milliseconds
+    ids = {kind: i for i, kind in enumerate(kinds)}
+    schedule = np.zeros(len(recipe), dtype=SCHEDULE_DTYPE)
+    for i, entry in enumerate(recipe):
+        if len(entry) != 2:
+            raise ValueError(f"Chart entry {i} should be [prompt, seconds], got {entry!r}")
+        kind, seconds = entry
+        if kind not in ids:
+            raise ValueError(f"Prompt {kind!r} is not allowed here, expected one of {sorted(ids)}")
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not 0 <= seconds < 2 ** 31 / 1000:
+            raise ValueError(f"Chart entry {i} ({kind!r}) has an invalid time {seconds!r}")
+        schedule[i] = (round(seconds * 1000), ids[kind])
+    return schedule[np.argsort(schedule["time"], kind="stable")]
+
+
+class LevelDefinition:
+    # Everything that differs between levels; ReactionGame.run_level plays any of them
+    def __init__(self, name, recipe, update_freq, prompts=DEFAULT_PROMPTS, gestures=DEFAULT_GESTURES,
+                 keys=DEFAULT_KEYS, debounce=0, confidence=config.GestureConfidence, window=config.JudgeWindow,
+                 hit_y=830, fall_step=10,
+                 spawn_pos=(300, 0), health=5, enemy_health=10, damage=1, reward=None):
+        self.name = name
+        self.kinds = tuple(prompts)     # prompt kind of each schedule["prompt"] id
+        if isinstance(recipe, np.ndarray):
+            # already compiled, e.g. from the level_file cache
+            if len(recipe) and recipe["prompt"].max() >= len(self.kinds):
+                raise ValueError(f"Compiled schedule has prompt ids beyond {self.kinds}")
+            self.schedule = recipe
+        else:
+            self.schedule = compile_schedule(recipe, self.kinds)
+        self.update_freq = update_freq  # ms per simulation step
+        self.prompts = prompts
+        self.gestures = gestures
+        self.keys = keys
+        self.debounce = debounce        # identical detector reads needed before the gesture changes
+        self.confidence = confidence    # or, for a smoothing detector, the confidence it needs
+        self.window = window            # (early, late) ms around the hit time a gesture counts
+        self.hit_y = hit_y              # prompts are due once their top passes this line
+        self.fall_step = fall_step      # px per simulation step
+        self.spawn_pos = spawn_pos
+        self.health = health
+        self.enemy_health = enemy_health
+        self.damage = damage
+        self.reward = reward            # ReactionGame attribute unlocked by winning
+        self.path = None                # level file it was loaded from
+        self.digest = None              # and the start of its content's sha256, see session_record
+
+    def entries(self):
+        # [(ms, prompt kind), ...] in spawn order
+        return [(int(t), self.kinds[i]) for t, i in self.schedule.tolist()]
+
+
+class LevelSession:
+    # The rules of one play of a level, without drawing or input handling: ReactionGame
+    # drives it from the real clock, camera and keyboard, session_record replays it from
+    # a recording. sim_time is in milliseconds since the level started; a session can
+    # start later in the chart (start_time), prompts scheduled before that are skipped.
+    #
+    # A prompt is not judged on whatever the gesture is when it reaches the hit line, but
+    # against every gesture shown within level.window of that moment, by the time the
+    # camera captured it minus `latency` ms (see judgement.LatencyCalibration). So the
+    # judgement waits until the camera has reported past the window, or JudgeMaxWait.
+    #
+    # In a two-player level every player has a session of their own, whose prompts fall
+    # in their lane: the x center `lane` instead of level.spawn_pos.
+    def __init__(self, level, prompts=None, recorder=None, latency=0, start_time=0, lane=None):
+        self.level = level
+        self.prompts = prompts if prompts is not None else PromptStore(level.prompts)
+        self.spawn_pos = level.spawn_pos if lane is None else (lane, level.spawn_pos[1])
+        self.recorder = recorder
+        self.latency = latency
+        self.history = GestureHistory()
+        self.pending = []         # (hit time, kind) of prompts waiting for their judgement
+        self.seen_until = start_time  # latest time the camera has reported on
+        self.health = level.health
+        self.enemy_health = level.enemy_health
+        self.gesture = "None"
+        self.gesture_time = None  # capture time behind self.gesture, None for keyboard input
+        self.confirmed_gesture = "None"
+        self.gesture_stability_counter = 0
+        self.spawn_index = int(level.schedule["time"].searchsorted(start_time))
+        self.sim_time = start_time
+        self.result = None        # "win" or "lose" once the level is over
+
+    def step(self, sim_time):
+        # One simulation step: move, judge what is due, spawn what is scheduled
+        level = self.level
+        self.sim_time = sim_time
+        for kind in self.prompts.move(level.fall_step, level.hit_y):
+            self.pending.append((sim_time, kind))
+        late = level.window[1]
+        while self.pending:
+            hit_time, kind = self.pending[0]
+            if self.seen_until < hit_time + late and sim_time < hit_time + late + config.JudgeMaxWait:
+                break
+            del self.pending[0]
+            self.judge(kind, hit_time)
+            if self.result:
+                return
+
+        # Prompts appear exactly at their schedule time, moved on by the part of
+        # the step that already passed
+        times = level.schedule["time"]
+        due = int(times.searchsorted(sim_time, "right"))
+        while self.spawn_index < due:
+            spawn_time, prompt = level.schedule[self.spawn_index].tolist()
+            kind = level.kinds[prompt]
+            self.prompts.spawn(kind, self.spawn_pos, (sim_time - spawn_time) * level.fall_step // level.update_freq)
+            log.debug("spawn", prompt=level.prompts[kind], sim_time=sim_time)
+            if self.recorder:
+                self.recorder.spawn(sim_time, kind)
+            self.spawn_index += 1
+
+    def judge(self, kind, hit_time):
+        level = self.level
+        required = level.prompts[kind]
+        if self.gesture_time is not None:
+            profiler.record("camera_to_judgement", self.gesture_time, time.perf_counter())
+        early, late = level.window
+        correct = required in self.history.shown_between(hit_time - early, hit_time + late)
+        gesture = required if correct else self.history.at(hit_time)
+        self.history.forget(hit_time - early)
+        if correct:
+            self.enemy_health -= level.damage
+            log.info("judgement", prompt=required, gesture=gesture, correct=True, enemy_health=self.enemy_health)
+        else:
+            self.health -= level.damage
+            log.info("judgement", prompt=required, gesture=gesture, correct=False, health=self.health)
+        if self.recorder:
+            self.recorder.hit(self.sim_time, kind, correct)
+
+        if self.health <= 0:
+            self.result = "lose"
+        elif self.enemy_health <= 0:
+            self.result = "win"
+
+    def observe(self, detected_gesture, detected_time=None, confidence=None, seen_at=None):
+        # Called once per frame with the detector's current gesture and, from a smoothing
+        # detector, its confidence: that gesture is taken as soon as the confidence is high
+        # enough. Without one, only switch after `debounce` identical reads.
+        # seen_at is the game time the camera captured it, None without a camera result.
+        seen = self.sim_time if seen_at is None else seen_at - self.latency
+        self.seen_until = max(self.seen_until, seen)
+        if confidence is not None and self.level.confidence is not None:
+            if confidence >= self.level.confidence:
+                self._adopt(detected_gesture, detected_time, seen)
+            return
+        if detected_gesture == self.confirmed_gesture:
+            self.gesture_stability_counter += 1
+            if self.gesture_stability_counter >= self.level.debounce:
+                self._adopt(detected_gesture, detected_time, seen)
+        else:
+            self.gesture_stability_counter = 0
+            self.confirmed_gesture = detected_gesture
+
+    def _adopt(self, detected_gesture, detected_time, seen):
+        mapped_gesture = self.level.gestures.get(detected_gesture, "None")
+        self.gesture_time = detected_time
+        self.history.add(seen, mapped_gesture)
+        if self.gesture != mapped_gesture:
+            self.gesture = mapped_gesture
+            log.debug("gesture", detected=detected_gesture, mapped=mapped_gesture)
+
+    def key(self, gesture):
+        self.gesture = gesture
+        self.gesture_time = None
+        self.history.add(self.sim_time, gesture)
+        log.info("keyboard", gesture=gesture)
+        if self.recorder:
+            self.recorder.key(self.sim_time, gesture)
+
+
+# Level number -> LevelDefinition, from the level files in config.LevelDir
+from level_file import load_levels
+LEVELS = load_levels()
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import time
+import hashlib
+import numpy as np
+import config
+from event_log import log
+
+# A level file is levels/level<N>.json or .toml, e.g.
+#
+#     {
+#         "name": "Level 1",
+#         "update_freq": 20,
+#         "debounce": 3,
+#         "reward": "amulet",
+#         "chart": [["sword", 4], ["fist", 6], ["shield", 7.4]]
+#     }
+#
+# chart entries are [prompt kind, seconds]. Every other LevelDefinition argument may be
+# given too: prompts ({kind: gesture}), gestures ({classify_hand label: gesture}), keys
+# ({pygame key name: gesture}, e.g. "s" for K_s), confidence, window, hit_y, fall_step,
+# spawn_pos, health, enemy_health, damage.
+FIELDS = {
+    "name", "chart", "update_freq", "prompts", "gestures", "keys", "debounce", "confidence", "window",
+    "hit_y", "fall_step", "spawn_pos", "health", "enemy_health", "damage", "reward",
+}
+NUMBER_FIELDS = ("debounce", "confidence", "hit_y", "fall_step", "health", "enemy_health", "damage")
+LEVEL_FILE = re.compile(r"level(\d+)\.(json|toml)$")
+
+# Bump when the compiled form changes, so old cache entries are not used
+CACHE_VERSION = 1
+
+
+def read_level_file(path):
+    with open(path, "rb") as file:
+        content = file.read()
+    try:
+        if path.endswith(".toml"):
+            import tomllib
+            data = tomllib.loads(content.decode("utf-8"))
+        else:
+            data = json.loads(content)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+    return content, data
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_mapping(value):
+    # {string: string}, e.g. prompts or keys
+    return isinstance(value, dict) and all(isinstance(k, str) and isinstance(v, str) for k, v in value.items())
+
+
+def level_arguments(data, path):
+    # Checks a parsed level file and turns it into LevelDefinition keyword arguments.
+    # Everything a file can get wrong is a ValueError naming it, so a hot reload of a
+    # half-edited file keeps the old level instead of failing in the game loop.
+    import pygame
+    from component import PROMPT_IMAGES
+    from level import DEFAULT_PROMPTS
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object at the top level")
+    unknown = set(data) - FIELDS
+    if unknown:
+        raise ValueError(f"{path}: unknown fields {sorted(unknown)}, expected some of {sorted(FIELDS)}")
+    for field in ("name", "chart", "update_freq"):
+        if field not in data:
+            raise ValueError(f"{path}: {field!r} is missing")
+    # bool is an int too, but `true` is no number of milliseconds
+    update_freq = data["update_freq"]
+    if isinstance(update_freq, bool) or not isinstance(update_freq, int) or update_freq <= 0:
+        raise ValueError(f"{path}: update_freq must be a positive number of milliseconds")
+    chart = data["chart"]
+    if not isinstance(chart, list):
+        raise ValueError(f"{path}: chart must be a list of [prompt, seconds] entries")
+    for i, entry in enumerate(chart):
+        if not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[0], str):
+            raise ValueError(f"{path}: chart entry {i} should be [prompt, seconds], got {entry!r}")
+    for field in ("prompts", "gestures", "keys"):
+        if field in data and not _is_mapping(data[field]):
+            raise ValueError(f"{path}: {field} must be an object of strings, got {data[field]!r}")
+    for field in ("window", "spawn_pos"):
+        value = data.get(field, ())
+        if field in data and (not isinstance(value, list) or len(value) != 2 or not all(map(_is_number, value))):
+            raise ValueError(f"{path}: {field} must be a pair of numbers, got {value!r}")
+    for field in NUMBER_FIELDS:
+        if field in data and not _is_number(data[field]):
+            raise ValueError(f"{path}: {field} must be a number, got {data[field]!r}")
+    # every prompt needs a sprite, see component.PROMPT_IMAGES
+    missing = set(data.get("prompts", DEFAULT_PROMPTS)) - set(PROMPT_IMAGES)
+    if missing:
+        raise ValueError(f"{path}: no sprite for prompts {sorted(missing)}, expected some of {sorted(PROMPT_IMAGES)}")
+    arguments = dict(data)
+    if "keys" in arguments:
+        keys = {}
+        for name, gesture in arguments["keys"].items():
+            code = getattr(pygame, "K_" + name, None)
+            if code is None:
+                raise ValueError(f"{path}: unknown key {name!r}")
+            keys[code] = gesture
+        arguments["keys"] = keys
+    for field in ("window", "spawn_pos"):
+        if field in arguments:
+            arguments[field] = tuple(arguments[field])
+    arguments["recipe"] = arguments.pop("chart")
+    return arguments
+
+
+def _cache_path(content, cache_dir):
+    digest = hashlib.sha256(content + f"|{CACHE_VERSION}".encode()).hexdigest()[:24]
+    return os.path.join(cache_dir, f"{digest}.npz")
+
+
+def load_level(path, cache_dir=None):
+    # LevelDefinition from a level file. The compiled schedule is cached in cache_dir
+    # under the hash of the file's content, so a long chart is only validated and
+    # sorted again after it changed.
+    from level import LevelDefinition
+    cache_dir = config.LevelCacheDir if cache_dir is None else cache_dir
+    content, data = read_level_file(path)
+    arguments = level_arguments(data, path)
+    cached = _cache_path(content, cache_dir) if cache_dir else None
+    from_cache = False
+    if cached and os.path.exists(cached):
+        try:
+            with np.load(cached) as stored:
+                arguments["recipe"] = stored["schedule"]
+            from_cache = True
+        except (OSError, ValueError, KeyError):
+            log.warning("level_cache_unreadable", path=cached)
+    try:
+        level = LevelDefinition(**arguments)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+    # also replaces a cache entry that could not be read
+    if cached and not from_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        # written next to its final name and renamed, so a reader never sees half a file
+        partial = f"{cached}.{os.getpid()}.tmp"
+        with open(partial, "wb") as file:
+            np.savez(file, schedule=level.schedule)
+        os.replace(partial, cached)
+    level.path = path
+    level.digest = hashlib.sha256(content).digest()[:16]
+    return level
+
+
+def level_files(directory):
+    # {level number: path} of the level files in `directory`
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        match = LEVEL_FILE.match(name)
+        if match:
+            number, path = int(match.group(1)), os.path.join(directory, name)
+            if number in files:
+                raise ValueError(f"level {number} is defined twice: {files[number]} and {path}")
+            files[number] = path
+    return files
+
+
+def load_levels(directory=None):
+    levels = {}
+    for number, path in level_files(directory or config.LevelDir).items():
+        levels[number] = load_level(path)
+        levels[number].number = number
+    return levels
+
+
+class LevelWatcher:
+    # Notices edited level files by polling their modification times, at most every
+    # `interval` seconds, so a chart can be changed while the game runs.
+    #
+    #     changed = watcher.poll()    # paths modified since the last poll
+    def __init__(self, paths, interval=0.5):
+        self.interval = interval
+        self.mtimes = {path: self._mtime(path) for path in paths}
+        self.next_poll = time.perf_counter() + interval
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self):
+        now = time.perf_counter()
+        if now < self.next_poll:
+            return []
+        self.next_poll = now + self.interval
+        changed = []
+        for path, mtime in self.mtimes.items():
+            current = self._mtime(path)
+            if current != mtime:
+                self.mtimes[path] = current
+                if current is not None:
+                    changed.append(path)
+        return changed
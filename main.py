@@ -1,33 +1,59 @@
 import pygame
 import config
 import component
-import sys
 from game import ReactionGame
+from scene import SceneManager, push, QUIT
+from event_log import log
 
 pygame.init()
 
 # game object
 def main_menu():
-    def start_game():
-        ReactionGame().preparation_scene()
-        print("Game Started")
-    def quit_game():
+    game = None
+
+    async def menu_scene(manager):
+        nonlocal game
+        chosen = []  # the scene a button asked for
+
+        def start_game():
+            chosen.append(push(game.preparation_scene))
+            print("Game Started")
+        def quit_game():
+            chosen.append(QUIT)
+        font = "./asset/WESTG___.ttf"
+        start_button = component.Button("Start Game", (config.screen_width // 6, 100), start_game,font)
+        quit_button = component.Button("Quit Game", (config.screen_width // 6, 300), quit_game,font)
+
+        config.get_screen().blit(component.load_background_image(), (0, 0))
+        start_button.draw(config.screen)
+        quit_button.draw(config.screen)
+        pygame.display.flip()
+
+        # Creating the game starts the camera and the hand model in the background,
+        # so they warm up while the menu is already on screen
+        if game is None:
+            game = ReactionGame()
+
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit_game()
+                start_button.is_clicked(event)
+                quit_button.is_clicked(event)
+            if chosen:
+                return chosen[0]
+            await manager.next_frame()
+
+    # Scenes push and pop each other on one loop, see scene.SceneManager
+    try:
+        SceneManager().run(menu_scene)
+    finally:
+        if game is not None:
+            game.close()
+        log.close()
         pygame.quit()
-        sys.exit()
-    font = "./asset/WESTG___.ttf"
-    start_button = component.Button("Start Game", (config.screen_width // 6, 100), start_game,font)
-    quit_button = component.Button("Quit Game", (config.screen_width // 6, 300), quit_game,font)
-
-    config.screen.blit(component.background_image, (0, 0))
-    start_button.draw(config.screen)
-    quit_button.draw(config.screen)
-    pygame.display.flip()
-
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                quit_game()
-            start_button.is_clicked(event)
-            quit_button.is_clicked(event)
-
-main_menu()
\ No newline at end of file
+
+# The process detector backend re-imports this module in its worker
+if __name__ == "__main__":
+    log.configure(path=config.EventLogPath, level=config.EventLogLevel)
+    main_menu()
\ No newline at end of file
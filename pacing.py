@@ -0,0 +1,73 @@
+import time
+
+class PacingScheduler:
+    # Paces the detector loop instead of a fixed sleep after every frame.
+    #
+    # target_hz:      desired gesture update rate, None runs unpaced (offline replay)
+    # latency_budget: seconds a camera frame may age before inference starts, older
+    #                 frames are dropped; defaults to one target period
+    # The loop only sleeps for whatever is left of the period after inference. When
+    # inference alone keeps taking more than max_utilization of the period the CPU is
+    # saturated and the period backs off (up to max_backoff times the target), then
+    # recovers once inference gets cheaper again.
+    def __init__(self, target_hz=30, latency_budget=None, max_utilization=0.8, max_backoff=4.0, smoothing=0.2):
+        self.target_period = 1.0 / target_hz if target_hz else 0.0
+        self.latency_budget = latency_budget
+        self.max_utilization = max_utilization
+        self.max_backoff = max_backoff
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.period = self.target_period
+        self.work_time = 0.0
+        self.next_time = None
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.skipped = 0
+        self.dropped = 0
+
+    def wait(self):
+        # Sleep until the next slot; a late loop starts right away without catching up
+        now = time.perf_counter()
+        if self.next_time is None or not self.period:
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        else:
+            self.next_time = now
+        self.next_time += self.period
+
+    def stale_after(self):
+        # Age at which a queued frame is treated as stale
+        if self.latency_budget is not None:
+            return max(self.latency_budget - self.work_time, 0.0)
+        return self.period
+
+    def frame_processed(self, work_time):
+        self.processed += 1
+        self.work_time += self.smoothing * (work_time - self.work_time)
+        if not self.target_period:
+            return
+        if self.work_time > self.max_utilization * self.period:
+            # saturated: stretch the period so inference fits into it
+            self.period = min(self.work_time / self.max_utilization, self.target_period * self.max_backoff)
+        else:
+            self.period = max(self.period * 0.9, self.target_period)
+
+    def frame_skipped(self):
+        self.skipped += 1
+
+    def frames_dropped(self, count):
+        self.dropped += count
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "rate_hz": self.processed / elapsed if elapsed > 0 else 0.0,
+            "period_ms": self.period * 1000,
+            "work_ms": self.work_time * 1000,
+        }
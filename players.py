@@ -0,0 +1,68 @@
+import itertools
+import numpy as np
+
+# Landmarks whose mean places a hand: the wrist and the base of every finger
+PALM = [0, 1, 5, 9, 13, 17]
+
+
+class PlayerTracker:
+    # Gives the hands found in a frame stable player numbers, so each player keeps their
+    # lane when hands cross, leave the frame or come back.
+    #
+    #     hands = tracker.assign(found, handedness)    # one (21, 2) hand or None per player
+    #
+    # Each hand goes to the player whose hand was closest in the previous frames; a
+    # MediaPipe handedness ("Left"/"Right") that differs from the one a player showed
+    # so far costs `handedness_cost` pixels, which keeps two crossing hands apart. A
+    # player missing for `forget_after` frames goes back to their side of the camera
+    # image: the camera isn't mirrored, so player 1 (the left lane) stands on the right
+    # of the image.
+    def __init__(self, players=2, frame_width=640, handedness_cost=200, forget_after=15):
+        self.players = players
+        # where each player is expected before their hand was seen, right to left
+        self.homes = [frame_width * (2 * (players - i) - 1) / (2 * players) for i in range(players)]
+        self.handedness_cost = handedness_cost
+        self.forget_after = forget_after
+        self.reset()
+
+    def reset(self):
+        self.positions = [None] * self.players   # palm center of each player's last hand
+        self.handedness = [None] * self.players
+        self.missing = [0] * self.players
+
+    def _cost(self, player, center, handedness):
+        position = self.positions[player]
+        if position is None:
+            cost = abs(center[0] - self.homes[player])
+        else:
+            cost = float(np.hypot(*(center - position)))
+        if handedness is not None and self.handedness[player] not in (None, handedness):
+            cost += self.handedness_cost
+        return cost
+
+    def assign(self, hands, handedness=None):
+        # hands: (21, 2) arrays in any order, at most `players` of them; handedness:
+        # their MediaPipe labels or None
+        hands = hands[:self.players]
+        handedness = list(handedness) if handedness is not None else [None] * len(hands)
+        centers = [hand[PALM].mean(axis=0) for hand in hands]
+        best, best_cost = None, None
+        for players in itertools.permutations(range(self.players), len(hands)):
+            cost = sum(self._cost(player, centers[i], handedness[i]) for i, player in enumerate(players))
+            if best_cost is None or cost < best_cost:
+                best, best_cost = players, cost
+
+        assigned = [None] * self.players
+        for i, player in enumerate(best or ()):
+            assigned[player] = hands[i]
+            self.positions[player] = centers[i]
+            self.missing[player] = 0
+            if handedness[i] is not None:
+                self.handedness[player] = handedness[i]
+        for player in range(self.players):
+            if assigned[player] is None:
+                self.missing[player] += 1
+                if self.missing[player] >= self.forget_after:
+                    self.positions[player] = None
+                    self.handedness[player] = None
+        return assigned
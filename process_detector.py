@@ -0,0 +1,307 @@
+import os
+import time
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from gesture_identify import GESTURES
+from event_log import log
+from gesture_channel import GestureChannel, GestureResult
+
+# Compact landmark record shared between the detector process and the game
+RECORD_DTYPE = np.dtype([
+    ("seq", np.uint64),           # seqlock: odd while the slot is being written
+    ("frame_id", np.uint64),
+    ("capture_time", np.float64), # time.perf_counter(), system wide monotonic clock
+    ("gesture", np.int8),         # index into GESTURES, -1 when no hand was found
+    ("has_hand", np.uint8),
+    ("confidence", np.float32),   # NaN without smoothing
+    ("changed_time", np.float64), # capture time at which the gesture took over, NaN if unknown
+    ("landmarks", np.float32, (21, 2)),
+], align=True)
+
+HEADER_SIZE = 64
+
+def encode_gesture(gesture):
+    return GESTURES.index(gesture) if gesture in GESTURES else -1
+
+def decode_gesture(code):
+    return GESTURES[code] if code >= 0 else "None"
+
+
+class LandmarkRing:
+    # Single producer ring buffer in shared memory. The writer never waits for readers:
+    # each slot carries a sequence number that is odd during a write, so a reader copies
+    # the slot and retries if the sequence changed underneath it.
+    def __init__(self, slots=16, name=None):
+        self.slots = slots
+        self.owner = name is None
+        size = HEADER_SIZE + slots * RECORD_DTYPE.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.head = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf)
+        self.records = np.ndarray((slots,), dtype=RECORD_DTYPE, buffer=self.shm.buf, offset=HEADER_SIZE)
+        if self.owner:
+            self.head[0] = 0
+            self.records[:] = np.zeros(slots, dtype=RECORD_DTYPE)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame_id, capture_time, gesture, landmarks, confidence=None, changed_time=None):
+        slot = frame_id % self.slots
+        records = self.records
+        records["seq"][slot] = 2 * frame_id + 1
+        records["frame_id"][slot] = frame_id
+        records["capture_time"][slot] = capture_time
+        records["gesture"][slot] = encode_gesture(gesture)
+        records["has_hand"][slot] = landmarks is not None
+        records["confidence"][slot] = np.nan if confidence is None else confidence
+        records["changed_time"][slot] = np.nan if changed_time is None else changed_time
+        if landmarks is not None:
+            records["landmarks"][slot] = landmarks
+        records["seq"][slot] = 2 * frame_id + 2
+        self.head[0] = frame_id + 1
+
+    def read_latest(self, retries=4):
+        # Copy of the newest complete record, or None before the first frame
+        for _ in range(retries):
+            count = int(self.head[0])
+            if count == 0:
+                return None
+            slot = (count - 1) % self.slots
+            seq = int(self.records["seq"][slot])
+            if seq & 1:
+                continue
+            record = self.records[slot].copy()
+            if int(self.records["seq"][slot]) == seq == int(record["seq"]):
+                return record
+        return None
+
+    def close(self):
+        self.head = None
+        self.records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _detector_worker(source, ring_names, slots, target_hz, latency_budget, ready, stop, active, new_result, options):
+    # Runs in the child process: capture, resize, color convert, MediaPipe and classify.
+    # Each player's results go to their own ring.
+    from frame_source import open_source
+    from gesture_detector import GestureDetector
+    from pacing import PacingScheduler
+
+    rings = [LandmarkRing(slots, name=name) for name in ring_names]
+    detector = None
+    try:
+        try:
+            if isinstance(source, (int, str)):
+                source = open_source(source)
+            scheduler = PacingScheduler(target_hz, latency_budget) if source.live else PacingScheduler(target_hz=None)
+            detector = GestureDetector(source, scheduler, **options)
+            detector.load_model()
+            detector.source.open()
+            detector.warm_up()
+        except Exception as e:
+            # the parent notices the process ended without `ready` and reports it too
+            log.error("detector_failed", error=repr(e))
+            return
+        detector.active = active
+
+        def forward(ring):
+            def write(result):
+                ring.write(result.frame_id, result.capture_time, result.gesture, result.landmarks,
+                           result.confidence, result.changed_time)
+                new_result.set()
+            return write
+        for ring, channel in zip(rings, detector.channels):
+            channel.subscribe(forward(ring))
+
+        # stop is a shared flag, not an Event: nobody sleeps on it, so the parent can
+        # raise it whether this process is still waiting, exiting or already gone
+        detector.running = True
+        def watch_stop():
+            while not stop.value:
+                time.sleep(0.1)
+            detector.running = False
+        threading.Thread(target=watch_stop, daemon=True).start()
+        ready.set()
+        detector.detect_loop()
+    finally:
+        if detector is not None:
+            detector.stop_detection()
+        for ring in rings:
+            ring.close()
+        # atexit doesn't run in a multiprocessing child, write out what was logged
+        log.close()
+
+
+class ProcessGestureDetector:
+    # Same interface as GestureDetector, but capture and inference run in a separate
+    # process so MediaPipe never holds the GIL of the pygame loop. Results come back
+    # through a LandmarkRing in shared memory, one per player.
+    def __init__(self, source=0, target_hz=30, latency_budget=None, slots=16, start_timeout=30, players=1, **options):
+        # source: camera index, recording path or an unopened frame_source object;
+        # options go to the GestureDetector in the child (resolution, roi, ...)
+        self.source = source
+        self.players = players
+        self.options = dict(options, players=players)
+        self.target_hz = target_hz
+        self.latency_budget = latency_budget
+        self.slots = slots
+        self.start_timeout = start_timeout
+        # spawn keeps the child free of the parent's pygame/SDL state
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.rings = []
+        self.stop_flag = None   # shared with the child, nonzero asks it to stop
+        self.running = False
+        self.ready = threading.Event()  # set once the child has its camera and model
+        # Shared with the child, cleared by pause(). A child killed while it waits on an
+        # Event leaves a sleeper that makes the next set() block, so start_detection()
+        # creates both Events afresh.
+        self.paused = False
+        self.active = None
+        self.new_result = None  # set by the child after each ring write
+        self.channels = [GestureChannel() for _ in range(players)]  # results copied out of the rings
+        self.channel = self.channels[0]
+        self.reader = None
+
+    def start_detection(self):
+        # Returns once the child is launched; until it is ready the game sees "None"
+        if self.running:
+            return
+        if self.process is not None or self.rings:
+            # a child that failed to start (see _wait_ready) still has its process,
+            # Events and shared memory
+            self.stop_detection()
+        self.rings = [LandmarkRing(self.slots) for _ in range(self.players)]
+        for channel in self.channels:
+            channel.clear()
+        self.active = self.context.Event()
+        if not self.paused:
+            self.active.set()
+        self.new_result = self.context.Event()
+        ready = self.context.Event()
+        self.stop_flag = self.context.Value("b", 0, lock=False)
+        self.process = self.context.Process(
+            target=_detector_worker,
+            args=(self.source, [ring.name for ring in self.rings], self.slots, self.target_hz, self.latency_budget, ready,
+                  self.stop_flag, self.active, self.new_result, self.options),
+            daemon=True,
+        )
+        # The spawned child re-imports the game's main module; point SDL at the dummy
+        # driver there so it never opens a second window
+        saved = {key: os.environ.get(key) for key in ("SDL_VIDEODRIVER", "PYGAME_HIDE_SUPPORT_PROMPT")}
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+        try:
+            self.process.start()
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+        self.running = True
+        threading.Thread(target=self._wait_ready, args=(ready, self.process), daemon=True).start()
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+
+    def _read_results(self):
+        # Moves each new ring record into its channel, so both backends offer the same
+        # latest() / wait() / subscribe() API; wakes up on the child's new_result event
+        rings = self.rings
+        new_result = self.new_result
+        last = [-1] * len(rings)
+        while self.running:
+            if not new_result.wait(0.1):
+                continue
+            new_result.clear()
+            for player, ring in enumerate(rings):
+                record = ring.read_latest()
+                if record is None or int(record["frame_id"]) <= last[player]:
+                    continue
+                last[player] = int(record["frame_id"])
+                landmarks = None
+                if record["has_hand"]:
+                    landmarks = record["landmarks"]
+                    landmarks.setflags(write=False)
+                confidence = None if np.isnan(record["confidence"]) else float(record["confidence"])
+                changed_time = None if np.isnan(record["changed_time"]) else float(record["changed_time"])
+                self.channels[player].publish(GestureResult(last[player], float(record["capture_time"]), landmarks,
+                                                            decode_gesture(int(record["gesture"])), confidence,
+                                                            changed_time))
+
+    def _wait_ready(self, ready, process):
+        deadline = time.monotonic() + self.start_timeout
+        while not ready.wait(0.1):
+            if not process.is_alive() or time.monotonic() > deadline:
+                log.error("detector_failed", error="Gesture detector process failed to start")
+                self.running = False
+                # reap it now; its rings and Events are released by stop_detection() or
+                # the next start_detection(), which may be running on the game's thread
+                process.join(timeout=2)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                return
+        self.ready.set()
+        log.info("detector_ready")
+
+    def pause(self):
+        self.paused = True
+        if self.active is not None:
+            self.active.clear()
+
+    def resume(self):
+        self.paused = False
+        if self.active is not None:
+            self.active.set()
+
+    def latest(self, player=0):
+        return self.channels[player].latest()
+
+    @property
+    def current_gesture(self):
+        result = self.channel.latest()
+        return result.gesture if result is not None else "None"
+
+    @property
+    def current_landmarks(self):
+        result = self.channel.latest()
+        return result.landmarks if result is not None else None
+
+    @property
+    def gesture_time(self):
+        result = self.channel.latest()
+        return result.capture_time if result is not None else None
+
+    @property
+    def frames_processed(self):
+        return int(self.rings[0].head[0]) if self.rings else 0
+
+    def stop_detection(self):
+        self.running = False
+        self.ready.clear()
+        if self.reader is not None:
+            # must be gone before the ring's shared memory is closed
+            self.reader.join(timeout=1)
+            self.reader = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.stop_flag.value = 1
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        # the child's Events go with it, see __init__
+        self.active = None
+        self.new_result = None
+        for ring in self.rings:
+            ring.close()
+        self.rings = []
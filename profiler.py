@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+class Profiler:
+    # Collects per-stage timings from the game loop and the detector thread.
+    #
+    #     with profiler.span("render"):
+    #         ...
+    #     profiler.record("inference", start, end)   # perf_counter() seconds
+    #
+    # Durations are kept per stage for percentiles; the most recent spans are kept as
+    # Chrome trace events (chrome://tracing, Perfetto). deque.append is atomic, so the
+    # detector thread can record without a lock.
+    def __init__(self, capacity=600, trace_capacity=20000):
+        self.enabled = True
+        self.capacity = capacity
+        self.stages = {}
+        self.events = deque(maxlen=trace_capacity)
+        self.origin = time.perf_counter()
+
+    def record(self, name, start, end):
+        if not self.enabled:
+            return
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages.setdefault(name, deque(maxlen=self.capacity))
+        samples.append((end - start) * 1000)
+        self.events.append((name, threading.get_ident(), start, end))
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def percentiles(self, name, quantiles=(50, 95, 99)):
+        samples = self.stages.get(name)
+        if not samples:
+            return None
+        return np.percentile(np.fromiter(samples, dtype=np.float64), quantiles)
+
+    def summary(self):
+        # {stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+        result = {}
+        for name, samples in list(self.stages.items()):
+            values = np.fromiter(samples, dtype=np.float64)
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            result[name] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(values.max()),
+            }
+        return result
+
+    def export_trace(self, path):
+        # Chrome trace event format, complete ("X") events in microseconds
+        pid = os.getpid()
+        events = [
+            {"name": name, "ph": "X", "pid": pid, "tid": tid,
+             "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+            for name, tid, start, end in list(self.events)
+        ]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def export_summary(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def export(self, directory):
+        # Writes trace-<time>.json and summary-<time>.json, returns both paths
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        trace_path = os.path.join(directory, f"trace-{stamp}.json")
+        summary_path = os.path.join(directory, f"summary-{stamp}.json")
+        self.export_trace(trace_path)
+        self.export_summary(summary_path)
+        return trace_path, summary_path
+
+    def clear(self):
+        self.stages.clear()
+        self.events.clear()
+
+profiler = Profiler()
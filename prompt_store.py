@@ -0,0 +1,92 @@
+import numpy as np
+import pygame
+from assets import assets
+
+class PromptStore:
+    # Active falling prompts as parallel NumPy arrays instead of one object per prompt.
+    # Slots [0, count) are live; moving every prompt is a single array add and an
+    # expired prompt is removed by moving the last live slot into its place. With the
+    # handful of prompts a level has on screen a step is slower than one object per
+    # prompt (NumPy's per-call overhead); it pays off from around a hundred prompts,
+    # see `python benchmark.py prompts`.
+    def __init__(self, kinds, image_paths=None, capacity=32, size=(100, 100)):
+        # kinds: prompt kinds this store holds, image_paths: kind -> sprite file.
+        # Images are only loaded once something is drawn, so the store also works headless.
+        self.kinds = list(kinds)
+        self.kind_ids = {kind: i for i, kind in enumerate(self.kinds)}
+        self.image_paths = image_paths
+        self.images = None
+        self.size = size
+        self.width, self.height = size
+        self.count = 0
+        self.serial = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(old, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+        self.x = grow(getattr(self, "x", None), np.int32)
+        self.y = grow(getattr(self, "y", None), np.int32)
+        self.prev_y = grow(getattr(self, "prev_y", None), np.int32)
+        self.kind = grow(getattr(self, "kind", None), np.int16)
+        self.order = grow(getattr(self, "order", None), np.int64)  # spawn order, for judging
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, kind, center, dy=0):
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        self.x[i] = center[0] - self.width // 2
+        self.prev_y[i] = center[1] - self.height // 2
+        self.y[i] = self.prev_y[i] + dy
+        self.kind[i] = self.kind_ids[kind]
+        self.order[i] = self.serial
+        self.serial += 1
+        self.count += 1
+
+    def move(self, dy, hit_y):
+        # Advance every prompt and return the kinds that passed hit_y, in spawn order
+        n = self.count
+        self.prev_y[:n] = self.y[:n]
+        self.y[:n] += dy
+        expired = np.flatnonzero(self.y[:n] > hit_y)
+        if not len(expired):
+            return []
+        expired = expired[np.argsort(self.order[expired])]
+        kinds = [self.kinds[k] for k in self.kind[expired]]
+        # highest slot first, so a slot that is about to be removed never gets swapped in
+        for i in np.sort(expired)[::-1]:
+            self.remove(i)
+        return kinds
+
+    def remove(self, i):
+        last = self.count - 1
+        if i != last:
+            for array in (self.x, self.y, self.prev_y, self.kind, self.order):
+                array[i] = array[last]
+        self.count = last
+
+    def blits(self, alpha=None):
+        # (image, rect) pairs for the renderer, alpha interpolates between the last two steps
+        if self.images is None:
+            self.images = [assets.image(self.image_paths[kind], self.size) for kind in self.kinds]
+        n = self.count
+        if alpha is None:
+            y = self.y[:n]
+        else:
+            y = np.rint(self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha).astype(np.int32)
+        images = self.images
+        w, h = self.width, self.height
+        return [
+            (images[k], pygame.Rect(x, top, w, h))
+            for k, x, top in zip(self.kind[:n].tolist(), self.x[:n].tolist(), y.tolist())
+        ]
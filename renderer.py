@@ -0,0 +1,57 @@
+import pygame
+
+class DirtyRenderer:
+    # Redraws only what changed and presents once per frame.
+    #
+    # The static scenery and HUD are composed into a cached background surface by
+    # `compose(surface)`, which returns the rects of the HUD elements it drew. Moving
+    # sprites are drawn on top every frame; their previous positions are restored from
+    # the background and only the touched rects are pushed to the display.
+    # Per frame: refresh_background() if the HUD changed, draw_blits(), present().
+    def __init__(self, screen, compose):
+        self.screen = screen
+        self.compose = compose
+        self.screen_rect = screen.get_rect()
+        # starts from whatever is on screen, compose() paints the scenery over it
+        self.background = screen.copy()
+        self.hud_rects = []
+        self.sprite_rects = []
+        self.dirty = []
+        self.full_redraw = True
+        self.refresh_background()
+
+    def refresh_background(self):
+        # Call when HUD values change; only the old and new HUD rects are redrawn
+        rects = self.compose(self.background) or []
+        if not self.full_redraw:
+            for rect in self.hud_rects + rects:
+                self.screen.blit(self.background, rect, rect)
+                self.dirty.append(rect)
+        self.hud_rects = rects
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def draw_blits(self, blits):
+        # Erase last frame's sprites, then draw the current (image, rect) pairs
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            background = self.background
+            self.screen.blits([(background, rect, rect) for rect in self.sprite_rects], False)
+            self.dirty.extend(self.sprite_rects)
+
+        screen_rect = self.screen_rect
+        visible = [(image, rect) for image, rect in blits if screen_rect.colliderect(rect)]
+        self.screen.blits(visible, False)
+        rects = [rect.clip(screen_rect) for image, rect in visible]
+        self.sprite_rects = rects
+        self.dirty.extend(rects)
+
+    def present(self):
+        if self.full_redraw:
+            self.full_redraw = False
+            pygame.display.flip()
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+        self.dirty = []
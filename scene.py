@@ -0,0 +1,97 @@
+import asyncio
+import time
+import config
+from event_log import log
+
+
+class Transition:
+    # What a scene returns when it is done, see push(), replace(), POP and QUIT
+    def __init__(self, action, scene=None):
+        self.action = action
+        self.scene = scene
+
+
+def push(scene):
+    # show `scene` on top; the current scene runs again once it pops
+    return Transition("push", scene)
+
+
+def replace(scene):
+    return Transition("replace", scene)
+
+
+POP = Transition("pop")
+QUIT = Transition("quit")
+
+
+class SceneManager:
+    # Runs the game's scenes on one asyncio loop with an explicit scene stack, so going
+    # from the menu to a level and back doesn't nest another call and another loop.
+    #
+    #     async def menu(manager):
+    #         while True:
+    #             for event in pygame.event.get():
+    #                 ...                             # return push(level) / POP / QUIT
+    #             pygame.display.flip()
+    #             await manager.next_frame()        # background tasks run in the gap
+    #
+    #     SceneManager().run(menu)
+    #
+    # A scene is any coroutine function taking the manager. Blocking work (waiting for
+    # the detector, loading images, writing files) goes to background(), which runs it
+    # on a worker thread and returns a task the scene can await or forget.
+    def __init__(self, fps=config.FPS):
+        self.fps = fps
+        self.stack = []
+        self.tasks = set()
+        self.frame_end = None
+
+    def run(self, scene):
+        # Blocks until a scene returns QUIT or the stack is empty
+        asyncio.run(self._main(scene))
+
+    async def _main(self, scene):
+        self.stack = [scene]
+        try:
+            while self.stack:
+                scene = self.stack[-1]
+                log.debug("scene", name=_name(scene), depth=len(self.stack))
+                transition = await scene(self)
+                if transition.action == "push":
+                    self.stack.append(transition.scene)
+                elif transition.action == "replace":
+                    self.stack[-1] = transition.scene
+                elif transition.action == "pop":
+                    self.stack.pop()
+                else:
+                    break
+        finally:
+            # let file writes finish, nothing else is worth waiting for
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.stack = []
+
+    def background(self, work, *args):
+        task = asyncio.ensure_future(asyncio.to_thread(work, *args))
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("background_task_failed", error=repr(task.exception()))
+
+    async def next_frame(self, fps=None):
+        # Ends a frame: gives the loop to other tasks until the next frame is due.
+        # A late frame starts the next one right away without catching up.
+        period = 1.0 / (fps or self.fps)
+        now = time.perf_counter()
+        if self.frame_end is None or now - self.frame_end > period:
+            self.frame_end = now
+        self.frame_end += period
+        await asyncio.sleep(max(self.frame_end - now, 0.0))
+
+
+def _name(scene):
+    # functools.partial(game.run_level, level) -> "run_level"
+    return getattr(getattr(scene, "func", scene), "__name__", repr(scene))
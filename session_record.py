@@ -0,0 +1,319 @@
+import os
+import sys
+import mmap
+import time
+import queue
+import struct
+import threading
+import numpy as np
+from gesture_identify import GESTURES
+from gesture_filter import GestureFilter
+
+# One fixed-size record per event, appended in the order the game saw them:
+#   LANDMARKS  the detector produced a new result: code = classify_hand label (-1: no hand),
+#              confidence = its smoothing confidence (NaN without smoothing), hand = index
+#              of its landmarks in SessionReader.hands (-1: no hand); with flags & SEEN
+#              sim_time is the game time the camera captured it
+#   FRAME      the game stepped to sim_time and debounced the current detector result
+#   KEY        keyboard gesture, code = GAME_GESTURES index
+#   SPAWN      code = prompt kind index (level.prompts order)
+#   HIT        a prompt was judged, code = prompt kind index, flags = 1 if correct
+FRAME, LANDMARKS, KEY, SPAWN, HIT = range(5)
+RECORD_NAMES = ("frame", "landmarks", "key", "spawn", "hit")
+HAND, SEEN = 1, 2  # LANDMARKS flags
+
+RECORD_DTYPE = np.dtype([
+    ("kind", np.uint8),
+    ("flags", np.uint8),
+    ("code", np.int16),
+    ("sim_time", np.int32),       # ms of game time
+    ("wall_time", np.float64),    # seconds since recording started
+    ("confidence", np.float32),
+    ("hand", np.int32),
+])
+HAND_DTYPE = np.dtype((np.float32, (21, 2)))
+
+# magic, record size, level number, step_ms, start time, judgement latency ms, level file
+# digest (see level_file.load_level, zeros for a level not loaded from a file); padded to
+# HEADER_SIZE. Then blocks of BLOCK (records, hands) followed by that many records and
+# that many landmark arrays, so only LANDMARKS records with a hand carry landmarks.
+HEADER = struct.Struct("<8sIIIdi16s")
+HEADER_SIZE = 64
+BLOCK = struct.Struct("<II")
+MAGIC = b"HFSESS04"
+
+GAME_GESTURES = ("None", "Sword", "Fist", "Shield", "Ok")
+
+
+class SessionRecorder:
+    # Append-only recording of one level. Records are collected in preallocated arrays
+    # and handed to a writer thread in blocks, so recording costs a few field stores per
+    # event and never waits for the disk; a file cut short by a crash is still readable
+    # up to its last complete block.
+    def __init__(self, path, level, latency=0, buffer_size=256):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.kinds = level.kinds
+        self.buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self.count = 0
+        # a block has at most one hand per record
+        self.hands = np.zeros(buffer_size, dtype=HAND_DTYPE)
+        self.hand_count = 0
+        self.hands_recorded = 0
+        self.start = time.perf_counter()
+        self.file = open(path, "wb")
+        header = HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, level.number, level.update_freq, time.time(), latency,
+                             level.digest or b"")
+        self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self.thread.start()
+
+    def _append(self, kind, sim_time, code=0, flags=0, landmarks=None, confidence=None):
+        if self.count == len(self.buffer):
+            self.flush()
+        record = self.buffer[self.count]
+        record["kind"] = kind
+        record["flags"] = flags
+        record["code"] = code
+        record["sim_time"] = sim_time
+        record["wall_time"] = time.perf_counter() - self.start
+        record["confidence"] = np.nan if confidence is None else confidence
+        if landmarks is None:
+            record["hand"] = -1
+        else:
+            self.hands[self.hand_count] = landmarks
+            record["hand"] = self.hands_recorded + self.hand_count
+            self.hand_count += 1
+        self.count += 1
+
+    def frame(self, sim_time):
+        self._append(FRAME, sim_time)
+
+    def landmarks(self, sim_time, gesture, landmarks, confidence=None, seen_at=None):
+        code = GESTURES.index(gesture) if gesture in GESTURES else -1
+        flags = (HAND if landmarks is not None else 0) | (SEEN if seen_at is not None else 0)
+        self._append(LANDMARKS, sim_time if seen_at is None else seen_at, code, flags, landmarks, confidence)
+
+    def key(self, sim_time, gesture):
+        self._append(KEY, sim_time, GAME_GESTURES.index(gesture))
+
+    def spawn(self, sim_time, kind):
+        self._append(SPAWN, sim_time, self.kinds.index(kind))
+
+    def hit(self, sim_time, kind, correct):
+        self._append(HIT, sim_time, self.kinds.index(kind), flags=correct)
+
+    def flush(self):
+        # Hands the collected block to the writer thread
+        if self.count:
+            self.queue.put(BLOCK.pack(self.count, self.hand_count) + self.buffer[:self.count].tobytes()
+                           + self.hands[:self.hand_count].tobytes())
+            self.hands_recorded += self.hand_count
+            self.count = 0
+            self.hand_count = 0
+
+    def _write_loop(self):
+        while True:
+            block = self.queue.get()
+            if block is None:
+                break
+            self.file.write(block)
+            self.file.flush()
+        self.file.close()
+
+    def close(self):
+        # Writes everything still collected and waits for the writer thread
+        if self.thread is None:
+            return
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+
+class MappedHands:
+    # The landmark arrays of a recording, left in the memory-mapped file one block at a
+    # time. hands[i] is a read-only (21, 2) view, hands[indices] copies just those hands.
+    def __init__(self, blocks):
+        self.blocks = [block for block in blocks if len(block)]
+        self.starts = np.cumsum([0] + [len(block) for block in self.blocks])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, index):
+        index = np.asarray(index, dtype=np.intp)
+        if index.size and (index.min() < 0 or index.max() >= len(self)):
+            raise IndexError(f"hand index out of range for {len(self)} hands")
+        block = self.starts.searchsorted(index, side="right") - 1
+        if index.ndim == 0:
+            return self.blocks[block][index - self.starts[block]]
+        hands = np.empty(index.shape, dtype=HAND_DTYPE)
+        for b in np.unique(block):
+            chosen = block == b
+            hands[chosen] = self.blocks[b][index[chosen] - self.starts[b]]
+        return hands
+
+
+class SessionReader:
+    # Reads a recording: `records` is a structured array of every event, `hands` the
+    # (N, 21, 2) landmarks LANDMARKS records point at. The file is memory-mapped; only
+    # the 24-byte records are gathered into one array, the hands stay in the mapping
+    # and are read when a replay looks one up.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is not a session recording of this version")
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, record_size, self.level_number, self.step_ms, self.started, self.latency, self.level_digest = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a session recording of this version")
+        records, hands = [], []
+        offset = HEADER_SIZE
+        while offset + BLOCK.size <= size:
+            count, hand_count = BLOCK.unpack_from(data, offset)
+            end = offset + BLOCK.size + count * RECORD_DTYPE.itemsize + hand_count * HAND_DTYPE.itemsize
+            if end > size:
+                break  # cut short while it was written
+            offset += BLOCK.size
+            records.append(np.frombuffer(data, RECORD_DTYPE, count, offset))
+            offset += count * RECORD_DTYPE.itemsize
+            hands.append(np.frombuffer(data, HAND_DTYPE, hand_count, offset))
+            offset = end
+        self.records = np.concatenate(records) if records else np.zeros(0, dtype=RECORD_DTYPE)
+        self.hands = MappedHands(hands)
+
+    def __len__(self):
+        return len(self.records)
+
+    def of_kind(self, kind):
+        return self.records[self.records["kind"] == kind]
+
+
+class _Outcome:
+    # Stands in for the recorder during replay and keeps what the replayed session did
+    def __init__(self):
+        self.spawns = []
+        self.hits = []
+
+    def spawn(self, sim_time, kind):
+        self.spawns.append((sim_time, kind))
+
+    def hit(self, sim_time, kind, correct):
+        self.hits.append((sim_time, kind, bool(correct)))
+
+    def key(self, sim_time, gesture):
+        pass
+
+
+def replay_session(path, relabel=None, debounce=None):
+    # Plays a recording back through the level rules without a clock or a window and
+    # re-judges it. relabel is what is being tuned:
+    #   None               the recorded gestures and confidences, reproduces the game
+    #   a GestureFilter    re-filters the recorded landmarks (tau, hysteresis, templates, ...)
+    #   a function         e.g. classify_hand, re-classifies every frame on its own and
+    #                      the level's debounce count applies (or `debounce`)
+    from level import LEVELS, LevelSession
+
+    reader = SessionReader(path)
+    level = LEVELS[reader.level_number]
+    if reader.level_digest != (level.digest or b"").ljust(16, b"\0"):
+        # the spawns and judgements would be compared against a different chart
+        raise ValueError(f"{path} was recorded with another version of {level.path or level.name}")
+    kinds = level.kinds
+    outcome = _Outcome()
+    session = LevelSession(level, recorder=outcome, latency=reader.latency)
+    if debounce is not None:
+        session.level = level = _with_debounce(level, debounce)
+
+    start = time.perf_counter()
+    step_ms = reader.step_ms
+    next_step = step_ms
+    detected = "None"
+    confidence = None
+    seen_at = None
+    frames = 0
+    for record in reader.records:
+        kind = record["kind"]
+        if kind == LANDMARKS:
+            landmarks = reader.hands[record["hand"]] if record["flags"] & HAND else None
+            seen_at = int(record["sim_time"]) if record["flags"] & SEEN else None
+            if relabel is None:
+                code = int(record["code"])
+                detected = GESTURES[code] if code >= 0 else "None"
+                confidence = None if np.isnan(record["confidence"]) else float(record["confidence"])
+            elif isinstance(relabel, GestureFilter):
+                detected, confidence, _ = relabel.update(landmarks, float(record["wall_time"]))
+            else:
+                detected = relabel(landmarks) if landmarks is not None else "None"
+        elif kind == FRAME:
+            target = int(record["sim_time"])
+            while next_step <= target and session.result is None:
+                session.step(next_step)
+                next_step += step_ms
+            session.observe(detected, None, confidence, seen_at)
+            frames += 1
+        elif kind == KEY:
+            session.key(GAME_GESTURES[record["code"]])
+        if session.result is not None:
+            break
+    else:
+        # the frame that ends a level is cut short before its FRAME record
+        events = reader.records["sim_time"][reader.records["kind"] != LANDMARKS]
+        last = int(events.max()) if len(events) else 0
+        while next_step <= last and session.result is None:
+            session.step(next_step)
+            next_step += step_ms
+    seconds = time.perf_counter() - start
+
+    recorded_spawns = [(int(r["sim_time"]), kinds[r["code"]]) for r in reader.of_kind(SPAWN)]
+    recorded_hits = [(int(r["sim_time"]), kinds[r["code"]], bool(r["flags"])) for r in reader.of_kind(HIT)]
+    return {
+        "level": level.name,
+        "result": session.result,
+        "health": session.health,
+        "enemy_health": session.enemy_health,
+        "frames": frames,
+        "hits": len(outcome.hits),
+        "correct": sum(correct for _, _, correct in outcome.hits),
+        "spawn_mismatches": _mismatches(recorded_spawns, outcome.spawns),
+        "hit_mismatches": _mismatches(recorded_hits, outcome.hits),
+        "seconds": seconds,
+    }
+
+
+def _with_debounce(level, debounce):
+    copy = object.__new__(type(level))
+    copy.__dict__.update(level.__dict__, debounce=debounce)
+    return copy
+
+
+def _mismatches(recorded, replayed):
+    return sum(a != b for a, b in zip(recorded, replayed)) + abs(len(recorded) - len(replayed))
+
+
+if __name__ == "__main__":
+    # python session_record.py replay sessions/level1-....hfs [recorded|filter|classify|templates] [debounce]
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from event_log import log
+    from gesture_identify import classify_hand
+    log.configure(level="warning")
+    if len(sys.argv) < 3 or sys.argv[1] != "replay":
+        print("usage: python session_record.py replay <file> [recorded|filter|classify|templates] [debounce]")
+        sys.exit(1)
+    mode = sys.argv[3] if len(sys.argv) > 3 else "recorded"
+    if mode == "templates":
+        # the recorded landmarks through a GestureFilter matching them against the template index
+        import config
+        from gesture_templates import TemplateIndex
+        relabel = GestureFilter(templates=TemplateIndex.load(config.GestureIndexPath))
+    else:
+        relabel = {"recorded": None, "filter": GestureFilter(), "classify": classify_hand}[mode]
+    debounce = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    result = replay_session(sys.argv[2], relabel, debounce)
+    for key, value in result.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,89 @@
+import os
+import json
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))  # sprites and levels are found relative to the game
+
+import config
+import level_file
+
+LEVEL = {"name": "Test", "update_freq": 20, "chart": [["sword", 1], ["fist", 2.5]]}
+
+
+def write_level(directory, data, name="level1.json"):
+    path = os.path.join(directory, name)
+    with open(path, "w") as file:
+        file.write(data if isinstance(data, str) else json.dumps(data))
+    return path
+
+
+def test_load_level(tmp_path):
+    level = level_file.load_level(write_level(tmp_path, LEVEL), cache_dir="")
+    assert level.entries() == [(1000, "sword"), (2500, "fist")]
+
+
+@pytest.mark.parametrize("fields", [
+    {"chart": 5},
+    {"chart": [5]},
+    {"chart": [["sword"]]},
+    {"chart": [[4, "sword"]]},
+    {"chart": [["kick", 4]]},
+    {"update_freq": True},
+    {"window": 5},
+    {"window": [-100]},
+    {"spawn_pos": "top"},
+    {"keys": ["s"]},
+    {"keys": {"s": 1}},
+    {"prompts": {"kick": "Kick"}, "chart": [["kick", 4]]},
+    {"health": "5"},
+    {"speed": 2},
+])
+def test_malformed_level_file(tmp_path, fields):
+    path = write_level(tmp_path, {**LEVEL, **fields})
+    with pytest.raises(ValueError, match=str(path)):
+        level_file.load_level(path, cache_dir="")
+
+
+def test_duplicate_level_number(tmp_path):
+    write_level(tmp_path, LEVEL)
+    write_level(tmp_path, 'name = "Test"\nupdate_freq = 20\nchart = [["sword", 1]]\n', "level1.toml")
+    with pytest.raises(ValueError, match="level 1"):
+        level_file.level_files(tmp_path)
+
+
+def test_unreadable_cache_is_rewritten(tmp_path):
+    path = write_level(tmp_path, LEVEL)
+    cache_dir = os.path.join(tmp_path, "cache")
+    level_file.load_level(path, cache_dir)
+    [entry] = os.listdir(cache_dir)
+    with open(os.path.join(cache_dir, entry), "wb") as file:
+        file.write(b"garbage")
+    level = level_file.load_level(path, cache_dir)
+    assert level_file.load_level(path, cache_dir).entries() == level.entries()
+    with open(os.path.join(cache_dir, entry), "rb") as file:
+        assert file.read() != b"garbage"
+
+
+@pytest.mark.parametrize("content", ['{ "name": "Test", "chart": [', {**LEVEL, "chart": [5]}, {**LEVEL, "keys": ["s"]}])
+def test_failed_hot_reload_keeps_the_level(tmp_path, monkeypatch, content):
+    import game
+    from level import LEVELS
+    from frame_source import SyntheticLandmarkSource
+    from gesture_detector import GestureDetector
+    monkeypatch.setattr(game, "create_gesture_detector",
+                        lambda players=1: GestureDetector(SyntheticLandmarkSource.from_gestures(["fist"]), players=players))
+    monkeypatch.setattr(config, "LevelCacheDir", "")
+    path = write_level(tmp_path, LEVEL)
+    level = level_file.load_level(path)
+    level.number = 99
+    monkeypatch.setitem(LEVELS, 99, level)
+    reaction_game = game.ReactionGame()
+    try:
+        write_level(tmp_path, content)
+        assert reaction_game.reload_level(level) is None
+        assert LEVELS[99] is level
+        write_level(tmp_path, {**LEVEL, "name": "Edited"})
+        assert reaction_game.reload_level(level).name == "Edited"
+    finally:
+        reaction_game.close()